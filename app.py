@@ -76,7 +76,7 @@ def ask():
         "answer": final_answer
     }
     chat_log.append(log_entry)
-    save_log(CHAT_LOG_FOLDER, chat_log)
+    save_log(CHAT_LOG_FOLDER, log_entry)
 
     return jsonify({"answer": final_answer})
 
@@ -91,6 +91,7 @@ def download():
 def feedback():
     data = request.get_json()
     chat_log[-1]["feedback"] = data.get("feedback")
+    save_log(CHAT_LOG_FOLDER, {"timestamp": chat_log[-1]["timestamp"], "feedback": data.get("feedback")})
     return jsonify({"status": "received"})
 
 if __name__ == '__main__':
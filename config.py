@@ -5,3 +5,4 @@ DEFAULT_CSV_PATH = "data/Training Dataset.csv"
 UPLOAD_FOLDER = "data/"
 CHAT_LOG_FOLDER = "chat_logs/"
 SECRET_KEY = "your_secret_key"
+TRANSLATION_MODEL = "facebook/nllb-200-distilled-600M"
@@ -36,6 +36,15 @@ CREATE INDEX IF NOT EXISTS idx_mood_entries_user_date ON mood_entries(user_id, c
 CREATE INDEX IF NOT EXISTS idx_messages_session_time ON messages(session_id, created_at);
 CREATE INDEX IF NOT EXISTS idx_assessments_user_type ON assessments(user_id, assessment_type);
 
+-- Create range indexes for admin analytics (created_at filter, grouped column included for index-only scans)
+CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at);
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_created_at ON chat_sessions(created_at);
+CREATE INDEX IF NOT EXISTS idx_mood_entries_created_score ON mood_entries(created_at, mood_score);
+CREATE INDEX IF NOT EXISTS idx_assessments_created_severity ON assessments(created_at, severity_level);
+
+-- Create recency indexes for the admin dashboard's newest-first lists
+CREATE INDEX IF NOT EXISTS idx_contact_messages_created_at ON contact_messages(created_at DESC);
+
 -- Grant permissions (adjust as needed for your setup)
 GRANT ALL PRIVILEGES ON DATABASE mental_health_chatbot TO postgres;
 GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO postgres;
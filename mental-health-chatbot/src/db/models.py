@@ -3,11 +3,37 @@ Database Models for Mental Health ChatBot
 """
 
 from datetime import datetime, timezone
+from functools import lru_cache
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
 from flask_login import UserMixin
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from src.db.database import db
-import json
+import orjson
+
+def _json_text(value):
+    """Encode a value for one of the JSON text columns"""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+class JSONText(db.TypeDecorator):
+    """JSON document kept in an existing TEXT column, encoded and decoded at the type level"""
+    impl = db.Text
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        return None if value is None else _json_text(value)
+    
+    def process_result_value(self, value, dialect):
+        return orjson.loads(value) if value else None
+
+# Shared Argon2 hasher (thread-safe) used for all new password hashes
+PASSWORD_HASHER = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1)
+
+@lru_cache(maxsize=1)
+def _dummy_password_hash():
+    """Hash checked when no user matches, so unknown usernames cost a full verify"""
+    return PASSWORD_HASHER.hash('dummy-password')
 
 class User(UserMixin, db.Model):
     """User model for authentication and profile management"""
@@ -30,7 +56,7 @@ class User(UserMixin, db.Model):
     last_login = db.Column(db.DateTime, nullable=True)
     
     # Relationships
-    chat_sessions = db.relationship('ChatSession', backref='user', lazy=True, cascade='all, delete-orphan')
+    chat_sessions = db.relationship('ChatSession', back_populates='user', lazy=True, cascade='all, delete-orphan')
     mood_entries = db.relationship('MoodEntry', backref='user', lazy=True, cascade='all, delete-orphan')
     assessments = db.relationship('Assessment', backref='user', lazy=True, cascade='all, delete-orphan')
     recommendations = db.relationship('Recommendation', backref='user', lazy=True, cascade='all, delete-orphan')
@@ -38,11 +64,34 @@ class User(UserMixin, db.Model):
     
     def set_password(self, password):
         """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = PASSWORD_HASHER.hash(password)
     
     def check_password(self, password):
         """Check password against hash"""
-        return check_password_hash(self.password_hash, password)
+        # Accounts created before the switch to Argon2 keep Werkzeug hashes until the next password change
+        if not self.password_hash.startswith('$argon2'):
+            return check_password_hash(self.password_hash, password)
+        try:
+            return PASSWORD_HASHER.verify(self.password_hash, password)
+        except (InvalidHashError, VerificationError):
+            return False
+    
+    @staticmethod
+    def check_dummy_password(password):
+        """Spend the same hashing work as a real check when no user matched"""
+        try:
+            PASSWORD_HASHER.verify(_dummy_password_hash(), password)
+        except VerificationError:
+            pass
+        return False
+    
+    @classmethod
+    def find_taken(cls, username, email):
+        """Check whether a username and email are already registered, in one query"""
+        rows = db.session.execute(
+            db.select(cls.username, cls.email).where((cls.username == username) | (cls.email == email))
+        ).all()
+        return any(row.username == username for row in rows), any(row.email == email for row in rows)
     
     def to_dict(self):
         """Convert user to dictionary"""
@@ -73,43 +122,51 @@ class ChatSession(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     
     # Relationships
+    user = db.relationship('User', back_populates='chat_sessions')
     messages = db.relationship('Message', backref='chat_session', lazy=True, cascade='all, delete-orphan')
     
     def get_context(self):
         """Get conversation context as dictionary"""
         if self.context_data:
-            return json.loads(self.context_data)
+            return orjson.loads(self.context_data)
         return {}
     
     def set_context(self, context_dict):
         """Set conversation context from dictionary"""
-        self.context_data = json.dumps(context_dict)
+        self.context_data = _json_text(context_dict)
 
 class Message(db.Model):
     """Message model for storing chat messages"""
     __tablename__ = 'messages'
+    # Chat history reads a session's messages in time order
+    __table_args__ = (
+        db.Index('idx_messages_session_time', 'session_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('chat_sessions.id'), nullable=False)
     sender = db.Column(db.String(20), nullable=False)  # 'user' or 'bot'
     content = db.Column(db.Text, nullable=False)
     message_type = db.Column(db.String(20), default='text')  # 'text', 'assessment', 'recommendation'
-    metadata = db.Column(db.Text, nullable=True)  # JSON string for additional data
+    # Stored in the "metadata" column; the attribute name is reserved by declarative models
+    message_metadata = db.Column('metadata', JSONText, nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
     def get_metadata(self):
         """Get message metadata as dictionary"""
-        if self.metadata:
-            return json.loads(self.metadata)
-        return {}
+        return self.message_metadata or {}
     
     def set_metadata(self, metadata_dict):
         """Set message metadata from dictionary"""
-        self.metadata = json.dumps(metadata_dict)
+        self.message_metadata = metadata_dict
 
 class MoodEntry(db.Model):
     """Mood tracking entries"""
     __tablename__ = 'mood_entries'
+    # Latest-entry lookups walk this index backwards and stop after one row
+    __table_args__ = (
+        db.Index('idx_mood_entries_user_date', 'user_id', db.text('created_at DESC')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -125,12 +182,12 @@ class MoodEntry(db.Model):
     def get_activities(self):
         """Get activities as list"""
         if self.activities:
-            return json.loads(self.activities)
+            return orjson.loads(self.activities)
         return []
     
     def set_activities(self, activities_list):
         """Set activities from list"""
-        self.activities = json.dumps(activities_list)
+        self.activities = _json_text(activities_list)
 
 class Assessment(db.Model):
     """Mental health assessment results"""
@@ -148,22 +205,31 @@ class Assessment(db.Model):
     def get_responses(self):
         """Get assessment responses as dictionary"""
         if self.responses:
-            return json.loads(self.responses)
+            return orjson.loads(self.responses)
         return {}
     
     def set_responses(self, responses_dict):
         """Set assessment responses from dictionary"""
-        self.responses = json.dumps(responses_dict)
+        self.responses = _json_text(responses_dict)
     
     def get_recommendations(self):
         """Get recommendations as list"""
         if self.recommendations:
-            return json.loads(self.recommendations)
+            return orjson.loads(self.recommendations)
         return []
     
     def set_recommendations(self, recommendations_list):
         """Set recommendations from list"""
-        self.recommendations = json.dumps(recommendations_list)
+        self.recommendations = _json_text(recommendations_list)
+    
+    @property
+    def interpretation(self):
+        """Reading of the score in the wording used when the assessment was scored"""
+        if self.assessment_type == 'PHQ-9':
+            return f'PHQ-9 score of {self.total_score} indicates {self.severity_level} depression'
+        if self.assessment_type == 'GAD-7':
+            return f'GAD-7 score of {self.total_score} indicates {self.severity_level} anxiety'
+        return f'Custom assessment score of {self.total_score} indicates {self.severity_level} level'
 
 class Recommendation(db.Model):
     """Personalized recommendations for users"""
@@ -231,15 +297,15 @@ class UserAchievement(db.Model):
     achievement_name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     points = db.Column(db.Integer, default=0)
-    metadata = db.Column(db.Text, nullable=True)  # JSON string for additional data
+    achievement_metadata = db.Column('metadata', db.Text, nullable=True)  # JSON string for additional data
     earned_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
     def get_metadata(self):
         """Get achievement metadata as dictionary"""
-        if self.metadata:
-            return json.loads(self.metadata)
+        if self.achievement_metadata:
+            return orjson.loads(self.achievement_metadata)
         return {}
     
     def set_metadata(self, metadata_dict):
         """Set achievement metadata from dictionary"""
-        self.metadata = json.dumps(metadata_dict)
\ No newline at end of file
+        self.achievement_metadata = _json_text(metadata_dict)
\ No newline at end of file
@@ -4,23 +4,109 @@ GPT Handler - OpenAI GPT API integration for empathetic conversations
 
 import os
 import json
-from typing import Dict, List, Any, Optional
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 from openai import OpenAI
+import httpx
+import tiktoken
+import ahocorasick
 from datetime import datetime
+from src.nlp.keywords import CRISIS_PHRASES
+
+def _build_phrase_automaton(phrases) -> ahocorasick.Automaton:
+    """Aho-Corasick automaton that finds every phrase, overlaps included, in one pass"""
+    automaton = ahocorasick.Automaton()
+    for phrase in phrases:
+        automaton.add_word(phrase.lower(), phrase)
+    automaton.make_automaton()
+    return automaton
+
+_CRISIS_AUTOMATON = _build_phrase_automaton(CRISIS_PHRASES)
+
+# Approximate per-message framing overhead of the chat completions format
+_TOKENS_PER_MESSAGE = 4
+
+# Distinct history messages whose token counts each handler keeps
+HISTORY_TOKEN_CACHE_SIZE = 4096
+
+# Custom assessment severity bands as fractions of the maximum possible score
+_CUSTOM_SEVERITY_BOUNDS = (0.2, 0.4, 0.6, 0.8)
+_CUSTOM_SEVERITY_LEVELS = ('very_low', 'low', 'moderate', 'high', 'very_high')
+
+# Line markers understood by _parse_recommendations
+_NUMBERED_PREFIXES = ('1.', '2.', '3.', '4.', '5.')
+_RECOMMENDATION_FIELDS = {
+    'Type': 'type',
+    'Description': 'description',
+    'Instructions': 'instructions',
+    'Priority': 'priority',
+    'Duration': 'duration'
+}
+
+# Fallback payloads returned when the OpenAI API call fails; copied per use
+_ERROR_TEMPLATE = {
+    'response': "I apologize, but I'm having trouble processing your message right now. Please try again in a moment.",
+    'error': None,
+    'conversation_type': None,
+    'timestamp': None
+}
+
+_FALLBACK_RECOMMENDATION = {
+    'type': 'general',
+    'title': 'General Support',
+    'description': 'Consider reaching out to a mental health professional for personalized support.',
+    'instructions': 'Contact a therapist or counselor for professional guidance.',
+    'priority': 3,
+    'duration': 'Ongoing'
+}
+
+# Shared OpenAI client so every handler reuses one connection pool
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client(api_key: str) -> OpenAI:
+    """Get the process-wide OpenAI client, creating it on first use"""
+    global _openai_client
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                # Keep-alive pool with HTTP/2 so repeated calls reuse connections
+                http_client = httpx.Client(
+                    http2=True,
+                    timeout=httpx.Timeout(60.0, connect=5.0),
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=32)
+                )
+                _openai_client = OpenAI(api_key=api_key, http_client=http_client)
+    return _openai_client
 
 class GPTHandler:
     """Handles GPT API interactions for mental health conversations"""
     
+    # Chat roles for conversation history senders (anything else is the assistant)
+    _ROLE_MAP = {'user': 'user', 'bot': 'assistant', 'assistant': 'assistant'}
+    
     def __init__(self):
         """Initialize GPT handler"""
         self.api_key = os.environ.get('OPENAI_API_KEY')
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = get_openai_client(self.api_key)
         self.model = os.environ.get('OPENAI_MODEL', 'gpt-4')
         self.max_tokens = int(os.environ.get('OPENAI_MAX_TOKENS', '1000'))
         self.temperature = float(os.environ.get('OPENAI_TEMPERATURE', '0.7'))
+        self.context_window = int(os.environ.get('OPENAI_CONTEXT_TOKENS', '8192'))
+        
+        # Tokenizer used to budget conversation history
+        try:
+            self._encoding = tiktoken.encoding_for_model(self.model)
+        except KeyError:
+            self._encoding = tiktoken.get_encoding('cl100k_base')
+        
+        # History messages recur on every later turn, so their token counts are cached by content
+        self._history_token_count = lru_cache(maxsize=HISTORY_TOKEN_CACHE_SIZE)(self._count_tokens)
         
         # System prompts for different conversation contexts
         self.system_prompts = {
@@ -64,6 +150,52 @@ CRISIS RESOURCES:
 5. Offer practical, actionable advice
 6. Encourage gradual progress"""
         }
+        self._system_prompt_tokens = {
+            prompt_type: self._count_tokens(prompt)
+            for prompt_type, prompt in self.system_prompts.items()
+        }
+    
+    def _build_messages(self,
+                        user_message: str,
+                        conversation_history: List[Dict[str, str]] = None,
+                        context: Dict[str, Any] = None,
+                        conversation_type: str = 'general') -> Tuple[List[Dict[str, str]], int]:
+        """Chat messages for a turn and the total token count of the prompt they make up"""
+        # Prepare system prompt; the base prompt is sent unmodified so the
+        # prefix stays byte-identical across turns for prompt caching
+        prompt_type = conversation_type if conversation_type in self.system_prompts else 'general'
+        messages = [{"role": "system", "content": self.system_prompts[prompt_type]}]
+        prompt_tokens = self._system_prompt_tokens[prompt_type]
+        
+        # Add context information as a separate system message
+        if context:
+            context_message = "Current context: " + self._format_context(context)
+            messages.append({"role": "system", "content": context_message})
+            prompt_tokens += self._count_tokens(context_message)
+        
+        user_tokens = self._count_tokens(user_message)
+        
+        # Add as much recent conversation history as fits the token budget
+        if conversation_history:
+            budget = self.context_window - self.max_tokens - prompt_tokens - user_tokens
+            history, history_tokens = self._pack_history(conversation_history, budget)
+            messages.extend(
+                {"role": self._ROLE_MAP.get(msg.get('sender'), 'assistant'), "content": msg.get('content', '')}
+                for msg in history
+            )
+            prompt_tokens += history_tokens
+        
+        # Add current user message
+        messages.append({"role": "user", "content": user_message})
+        return messages, prompt_tokens + user_tokens
+    
+    def _error_response(self, error: Exception, conversation_type: str) -> Dict[str, Any]:
+        """Fallback payload for a failed OpenAI call"""
+        error_response = _ERROR_TEMPLATE.copy()
+        error_response['error'] = str(error)
+        error_response['conversation_type'] = conversation_type
+        error_response['timestamp'] = datetime.now().isoformat()
+        return error_response
     
     def generate_response(self, 
                          user_message: str,
@@ -72,27 +204,7 @@ CRISIS RESOURCES:
                          conversation_type: str = 'general') -> Dict[str, Any]:
         """Generate empathetic response using GPT"""
         try:
-            # Prepare system prompt
-            system_prompt = self.system_prompts.get(conversation_type, self.system_prompts['general'])
-            
-            # Add context information to system prompt
-            if context:
-                context_info = self._format_context(context)
-                system_prompt += f"\n\nCurrent context: {context_info}"
-            
-            # Prepare messages
-            messages = [{"role": "system", "content": system_prompt}]
-            
-            # Add conversation history
-            if conversation_history:
-                for msg in conversation_history[-10:]:  # Keep last 10 messages for context
-                    messages.append({
-                        "role": "user" if msg.get('sender') == 'user' else "assistant",
-                        "content": msg.get('content', '')
-                    })
-            
-            # Add current user message
-            messages.append({"role": "user", "content": user_message})
+            messages, _ = self._build_messages(user_message, conversation_history, context, conversation_type)
             
             # Generate response
             response = self.client.chat.completions.create(
@@ -118,23 +230,53 @@ CRISIS RESOURCES:
             }
             
         except Exception as e:
-            return {
-                'response': "I apologize, but I'm having trouble processing your message right now. Please try again in a moment.",
-                'error': str(e),
-                'conversation_type': conversation_type,
-                'timestamp': datetime.now().isoformat()
-            }
+            return self._error_response(e, conversation_type)
+    
+    def stream_response(self,
+                        user_message: str,
+                        conversation_history: List[Dict[str, str]] = None,
+                        context: Dict[str, Any] = None,
+                        conversation_type: str = 'general') -> Iterator[Tuple[str, Any]]:
+        """Stream a GPT response as ('delta', text) events, then one ('result', response) event"""
+        parts = []
+        try:
+            messages, prompt_tokens = self._build_messages(user_message, conversation_history, context, conversation_type)
+            
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                presence_penalty=0.1,
+                frequency_penalty=0.1,
+                stream=True
+            )
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield 'delta', delta
+        except Exception as e:
+            # Text already sent cannot be retracted, so only a failure before any delta falls back
+            if not parts:
+                yield 'result', self._error_response(e, conversation_type)
+                return
+        
+        bot_response = ''.join(parts).strip()
+        # Streamed completions carry no usage block, so count the tokens locally
+        yield 'result', {
+            'response': bot_response,
+            'conversation_type': conversation_type,
+            'safety_check': self._safety_check(bot_response),
+            'tokens_used': prompt_tokens + self._count_tokens(bot_response),
+            'timestamp': datetime.now().isoformat()
+        }
     
     def detect_crisis_keywords(self, message: str) -> Dict[str, Any]:
         """Detect crisis keywords in user message"""
-        crisis_keywords = [
-            'suicide', 'kill myself', 'end it all', 'not worth living',
-            'hurt myself', 'self harm', 'cut myself', 'overdose',
-            'jump off', 'hang myself', 'die', 'death', 'dead'
-        ]
-        
-        message_lower = message.lower()
-        detected_keywords = [keyword for keyword in crisis_keywords if keyword in message_lower]
+        found = {phrase for _, phrase in _CRISIS_AUTOMATON.iter(message.lower())}
+        # Report matches in CRISIS_PHRASES order, as the substring scan did
+        detected_keywords = [keyword for keyword in CRISIS_PHRASES if keyword in found] if found else []
         
         return {
             'is_crisis': len(detected_keywords) > 0,
@@ -198,14 +340,28 @@ CRISIS RESOURCES:
             return self._parse_recommendations(recommendations_text)
             
         except Exception as e:
-            return [{
-                'type': 'general',
-                'title': 'General Support',
-                'description': 'Consider reaching out to a mental health professional for personalized support.',
-                'instructions': 'Contact a therapist or counselor for professional guidance.',
-                'priority': 3,
-                'duration': 'Ongoing'
-            }]
+            return [_FALLBACK_RECOMMENDATION.copy()]
+    
+    def _count_tokens(self, text: str) -> int:
+        """Count tokens in text including per-message overhead"""
+        return len(self._encoding.encode(text)) + _TOKENS_PER_MESSAGE
+    
+    def _pack_history(self, history: List[Dict[str, str]], budget: int) -> Tuple[List[Dict[str, str]], int]:
+        """Select the most recent messages whose combined size fits within budget, and their token count"""
+        packed = []
+        used = 0
+        
+        for msg in reversed(history):
+            # The messages belong to the caller's conversation context, so they are never modified
+            tokens = self._history_token_count(msg.get('content', ''))
+            
+            if used + tokens > budget:
+                break
+            used += tokens
+            packed.append(msg)
+        
+        packed.reverse()
+        return packed, used
     
     def _format_context(self, context: Dict[str, Any]) -> str:
         """Format context information for GPT"""
@@ -494,16 +650,9 @@ CRISIS RESOURCES:
         total_score = sum(responses.values())
         max_possible = len(responses) * 5  # Assuming 5-point scale
         
-        if total_score <= max_possible * 0.2:
-            severity = 'very_low'
-        elif total_score <= max_possible * 0.4:
-            severity = 'low'
-        elif total_score <= max_possible * 0.6:
-            severity = 'moderate'
-        elif total_score <= max_possible * 0.8:
-            severity = 'high'
-        else:
-            severity = 'very_high'
+        # Band lookup: first bound the score does not exceed
+        limits = [max_possible * bound for bound in _CUSTOM_SEVERITY_BOUNDS]
+        severity = _CUSTOM_SEVERITY_LEVELS[bisect_left(limits, total_score)]
         
         return {
             'total_score': total_score,
@@ -526,20 +675,18 @@ CRISIS RESOURCES:
                     current_rec = {}
                 continue
             
-            if line.startswith('1.') or line.startswith('2.') or line.startswith('3.') or line.startswith('4.') or line.startswith('5.'):
+            if line.startswith(_NUMBERED_PREFIXES):
                 if current_rec:
                     recommendations.append(current_rec)
                 current_rec = {'title': line[3:].strip()}
-            elif line.startswith('Type:'):
-                current_rec['type'] = line.split(':', 1)[1].strip()
-            elif line.startswith('Description:'):
-                current_rec['description'] = line.split(':', 1)[1].strip()
-            elif line.startswith('Instructions:'):
-                current_rec['instructions'] = line.split(':', 1)[1].strip()
-            elif line.startswith('Priority:'):
-                current_rec['priority'] = int(line.split(':', 1)[1].strip())
-            elif line.startswith('Duration:'):
-                current_rec['duration'] = line.split(':', 1)[1].strip()
+                continue
+            
+            label, separator, value = line.partition(':')
+            field = _RECOMMENDATION_FIELDS.get(label) if separator else None
+            if field == 'priority':
+                current_rec['priority'] = int(value.strip())
+            elif field:
+                current_rec[field] = value.strip()
         
         if current_rec:
             recommendations.append(current_rec)
@@ -2,14 +2,50 @@
 Intent Detection Module - Identifies user intentions and conversation goals
 """
 
+import copy
 import re
-from typing import Dict, List, Any, Tuple
+import threading
+from functools import lru_cache
+from typing import Dict, List, Any, Tuple, Optional
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.pipeline import Pipeline
+import ahocorasick
 import joblib
+import numpy as np
+from scipy.special import logsumexp
+from src.nlp.keywords import CRISIS_PHRASE_GROUPS
 import os
 
+# Matches intent patterns of the form \b(word|other phrase)\b
+_LITERAL_GROUP_PATTERN = re.compile(r"^\\b\((.+)\)\\b$")
+_REGEX_METACHARACTERS = frozenset('.^$*+?{}[]\\|()')
+
+# Context cue words are matched against whole tokens, so 'no' does not fire on 'know'
+_CONTEXT_TOKEN_PATTERN = re.compile(r"[\w']+")
+_NEGATION_WORDS = frozenset({'not', 'no', 'never', 'can\'t', 'won\'t', 'don\'t'})
+_INTENSIFIER_WORDS = frozenset({'very', 'really', 'extremely', 'so', 'too'})
+_TIME_REFERENCE_WORDS = frozenset({'today', 'yesterday', 'tomorrow', 'now', 'recently', 'always', 'never'})
+_UNCERTAINTY_WORDS = frozenset({'maybe', 'perhaps', 'might', 'could', 'possibly'})
+_UNCERTAINTY_PHRASES = ('not sure',)
+
+# Urgency cues include multi-word phrases and are matched as substrings
+_HIGH_URGENCY_WORDS = (
+    'urgent', 'emergency', 'crisis', 'help', 'now', 'immediately',
+    'can\'t take it', 'breaking down', 'falling apart'
+)
+
+def _compile_substring_scan(words) -> re.Pattern:
+    """Compile a word list into one alternation scanned in a single C-level pass"""
+    return re.compile('|'.join(re.escape(word) for word in words))
+
+_HIGH_URGENCY_SCAN = _compile_substring_scan(_HIGH_URGENCY_WORDS)
+_MEDIUM_URGENCY_INTENTS = frozenset({'depression', 'anxiety', 'professional_help'})
+
+def _is_word_char(char: str) -> bool:
+    """Check whether a character counts as a word character for \\b boundaries"""
+    return char.isalnum() or char == '_'
+
 class IntentDetector:
     """Detects user intentions in mental health conversations"""
     
@@ -26,12 +62,7 @@ class IntentDetector:
                 r'\b(thanks|thank you|thank you very much)\b',
                 r'\b(that\'s all|that\'s it|nothing else)\b'
             ],
-            'crisis': [
-                r'\b(kill myself|suicide|end it all|not worth living)\b',
-                r'\b(hurt myself|self harm|cut myself|overdose)\b',
-                r'\b(jump off|hang myself|die|death|dead)\b',
-                r'\b(better off dead|want to die|end my life)\b'
-            ],
+            'crisis': [r'\b(' + '|'.join(group) + r')\b' for group in CRISIS_PHRASE_GROUPS],
             'depression': [
                 r'\b(depressed|depression|sad|hopeless|worthless)\b',
                 r'\b(empty|guilty|shame|down|low)\b',
@@ -97,24 +128,41 @@ class IntentDetector:
             ]
         }
         
-        # Initialize ML model for intent classification
-        self.ml_model = None
-        self.vectorizer = None
-        self.model_path = 'data/models/intent_classifier.pkl'
-        self._load_or_train_model()
+        # Fixed intent ordering so scores can be held in arrays indexed by intent id
+        self._intent_names = list(self.intent_patterns)
+        self._intent_index = {name: i for i, name in enumerate(self._intent_names)}
+        self._pattern_counts = np.array([len(self.intent_patterns[name]) for name in self._intent_names])
+        self._thread_local = threading.local()
+        
+        # Build keyword automaton for single-pass pattern matching
+        self._build_pattern_matcher()
+        
+        # Per-instance LRU cache of detection results keyed by normalized text
+        cache_size = int(os.environ.get('INTENT_CACHE_SIZE', '4096'))
+        self._detect_intent_cached = lru_cache(maxsize=cache_size)(self._detect_intent)
+        
+        # ML model for intent classification, shared by every detector instance
+        self.model_path = os.environ.get('INTENT_MODEL_PATH', 'data/models/intent_classifier.pkl')
+        self._ml_class_positions = None
+        self.ml_model, self.vectorizer = self._load_or_train_model(self.model_path)
+        if self.ml_model is not None:
+            self._index_ml_classes()
     
     def detect_intent(self, text: str) -> Dict[str, Any]:
         """Detect user intent from text"""
-        text_lower = text.lower().strip()
-        
+        # Cached results are shared between calls, so each caller gets its own copy
+        return copy.deepcopy(self._detect_intent_cached(text.lower().strip()))
+    
+    def _detect_intent(self, text_lower: str) -> Dict[str, Any]:
+        """Detect intent from normalized text without consulting the cache"""
         # Pattern-based detection
-        pattern_results = self._detect_by_patterns(text_lower)
+        pattern_scores = self._detect_by_patterns(text_lower)
         
         # ML-based detection
-        ml_results = self._detect_by_ml(text_lower)
+        ml_scores = self._detect_by_ml(text_lower)
         
         # Combine results
-        combined_intent = self._combine_results(pattern_results, ml_results)
+        combined_intent = self._combine_results(pattern_scores, ml_scores)
         
         # Additional context analysis
         context_info = self._analyze_context(text_lower)
@@ -123,129 +171,191 @@ class IntentDetector:
             'primary_intent': combined_intent['primary_intent'],
             'confidence': combined_intent['confidence'],
             'all_intents': combined_intent['all_intents'],
-            'pattern_matches': pattern_results,
-            'ml_predictions': ml_results,
+            'pattern_matches': self._scores_to_dict(pattern_scores, pattern_scores > 0),
+            'ml_predictions': self._scores_to_dict(ml_scores) if ml_scores is not None else {},
             'context_info': context_info,
             'urgency_level': self._assess_urgency(text_lower, combined_intent['primary_intent'])
         }
     
-    def _detect_by_patterns(self, text: str) -> Dict[str, float]:
-        """Detect intent using regex patterns"""
-        pattern_scores = {}
+    def _detect_by_patterns(self, text: str) -> np.ndarray:
+        """Detect intent using regex patterns, returning scores indexed by intent id"""
+        matched_patterns = {}
+        
+        # Single scan over the text for every literal keyword
+        text_length = len(text)
+        for end, (length, targets) in self._keyword_automaton.iter(text):
+            start = end - length + 1
+            if start > 0 and _is_word_char(text[start - 1]):
+                continue
+            if end + 1 < text_length and _is_word_char(text[end + 1]):
+                continue
+            for intent, pattern_id in targets:
+                matched_patterns.setdefault(intent, set()).add(pattern_id)
+        
+        # Patterns that could not be reduced to literal keywords (none of the built-in ones)
+        for intent, pattern_id, compiled_pattern in self._regex_patterns:
+            if compiled_pattern.search(text):
+                matched_patterns.setdefault(intent, set()).add(pattern_id)
+        
+        # Reuse a per-thread score buffer; callers consume it before the next detection
+        pattern_scores = getattr(self._thread_local, 'pattern_scores', None)
+        if pattern_scores is None:
+            pattern_scores = self._thread_local.pattern_scores = np.zeros(len(self._intent_names))
+        else:
+            pattern_scores.fill(0)
+        
+        for intent, pattern_ids in matched_patterns.items():
+            pattern_scores[self._intent_index[intent]] = len(pattern_ids)
+        
+        # Normalize score by number of patterns
+        np.divide(pattern_scores, self._pattern_counts, out=pattern_scores)
+        return np.minimum(pattern_scores, 1.0, out=pattern_scores)
+    
+    def _build_pattern_matcher(self):
+        """Compile intent patterns into a keyword automaton plus compiled regexes"""
+        self._keyword_automaton = ahocorasick.Automaton()
+        self._regex_patterns = []
         
         for intent, patterns in self.intent_patterns.items():
-            score = 0
-            matches = []
-            
-            for pattern in patterns:
-                if re.search(pattern, text, re.IGNORECASE):
-                    score += 1
-                    matches.append(pattern)
-            
-            if score > 0:
-                # Normalize score by number of patterns
-                pattern_scores[intent] = min(score / len(patterns), 1.0)
+            for pattern_id, pattern in enumerate(patterns):
+                keywords = self._extract_keywords(pattern)
+                if keywords is None:
+                    # Falls back to a separate re.search per message; keep patterns literal where possible
+                    print(f"Warning: intent pattern for '{intent}' is not a literal alternation, matching it with re: {pattern}")
+                    # Text is lowercased by detect_intent, so no IGNORECASE needed
+                    self._regex_patterns.append((intent, pattern_id, re.compile(pattern)))
+                    continue
+                
+                for keyword in keywords:
+                    # The same keyword may belong to several intents (e.g. 'tired')
+                    length, targets = self._keyword_automaton.get(keyword, (len(keyword), []))
+                    targets.append((intent, pattern_id))
+                    self._keyword_automaton.add_word(keyword, (length, targets))
         
-        return pattern_scores
+        self._keyword_automaton.make_automaton()
     
-    def _detect_by_ml(self, text: str) -> Dict[str, float]:
-        """Detect intent using ML model"""
+    def _extract_keywords(self, pattern: str) -> Optional[List[str]]:
+        """Split a word-bounded alternation pattern into its literal keywords"""
+        match = _LITERAL_GROUP_PATTERN.match(pattern)
+        if not match:
+            return None
+        
+        keywords = [alternative.replace("\\'", "'").lower() for alternative in match.group(1).split('|')]
+        if any(_REGEX_METACHARACTERS.intersection(keyword) for keyword in keywords):
+            return None
+        
+        return keywords
+    
+    def _detect_by_ml(self, text: str) -> Optional[np.ndarray]:
+        """Detect intent using ML model, returning scores indexed by intent id"""
         if not self.ml_model:
-            return {}
+            return None
         
         try:
-            # Predict probabilities for all classes
-            probabilities = self.ml_model.predict_proba([text])[0]
-            class_names = self.ml_model.classes_
+            # Naive Bayes joint log likelihood straight from the sparse TF-IDF row
+            features = self.vectorizer.transform([text])
+            joint_log_likelihood = np.asarray(features @ self._nb_feature_log_prob).ravel() + self._nb_class_log_prior
+            probabilities = np.exp(joint_log_likelihood - logsumexp(joint_log_likelihood))
             
-            ml_scores = {}
-            for i, class_name in enumerate(class_names):
-                ml_scores[class_name] = float(probabilities[i])
+            # Scatter class probabilities into intent order
+            ml_scores = np.zeros(len(self._intent_names))
+            ml_scores[self._ml_class_positions] = probabilities
             
             return ml_scores
         except Exception as e:
             print(f"Error in ML intent detection: {e}")
-            return {}
+            return None
     
-    def _combine_results(self, pattern_results: Dict, ml_results: Dict) -> Dict[str, Any]:
+    def _combine_results(self, pattern_scores: np.ndarray, ml_scores: Optional[np.ndarray]) -> Dict[str, Any]:
         """Combine pattern and ML results"""
-        all_intents = {}
-        
-        # Combine scores from both methods
-        for intent in set(list(pattern_results.keys()) + list(ml_results.keys())):
-            pattern_score = pattern_results.get(intent, 0)
-            ml_score = ml_results.get(intent, 0)
-            
+        # Only intents matched by a pattern take part in the vote; ML scores just rank those
+        candidates = pattern_scores > 0
+        if ml_scores is None:
+            combined_scores = 0.7 * pattern_scores
+        else:
             # Weighted combination (patterns get higher weight for exact matches)
-            combined_score = (pattern_score * 0.7) + (ml_score * 0.3)
-            all_intents[intent] = combined_score
+            combined_scores = 0.7 * pattern_scores + 0.3 * ml_scores
         
         # Find primary intent
-        if all_intents:
-            primary_intent = max(all_intents, key=all_intents.get)
-            confidence = all_intents[primary_intent]
+        if candidates.any():
+            primary_index = int(np.where(candidates, combined_scores, -1.0).argmax())
+            primary_intent = self._intent_names[primary_index]
+            confidence = float(combined_scores[primary_index])
         else:
             primary_intent = 'general_question'
             confidence = 0.1
         
+        all_intents = self._scores_to_dict(combined_scores, candidates)
+        
         return {
             'primary_intent': primary_intent,
             'confidence': confidence,
             'all_intents': all_intents
         }
     
+    def _scores_to_dict(self, scores: np.ndarray, mask: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """Convert an intent score array back to a name -> score mapping"""
+        if mask is None:
+            return {name: float(score) for name, score in zip(self._intent_names, scores)}
+        return {self._intent_names[i]: float(scores[i]) for i in np.flatnonzero(mask)}
+    
     def _analyze_context(self, text: str) -> Dict[str, Any]:
         """Analyze additional context information"""
+        tokens = set(_CONTEXT_TOKEN_PATTERN.findall(text))
         context = {
             'has_question': '?' in text,
             'has_exclamation': '!' in text,
             'text_length': len(text.split()),
-            'has_negation': any(word in text for word in ['not', 'no', 'never', 'can\'t', 'won\'t', 'don\'t']),
-            'has_intensifiers': any(word in text for word in ['very', 'really', 'extremely', 'so', 'too']),
-            'has_time_references': any(word in text for word in ['today', 'yesterday', 'tomorrow', 'now', 'recently', 'always', 'never']),
-            'has_uncertainty': any(word in text for word in ['maybe', 'perhaps', 'might', 'could', 'possibly', 'not sure'])
+            'has_negation': not tokens.isdisjoint(_NEGATION_WORDS),
+            'has_intensifiers': not tokens.isdisjoint(_INTENSIFIER_WORDS),
+            'has_time_references': not tokens.isdisjoint(_TIME_REFERENCE_WORDS),
+            'has_uncertainty': not tokens.isdisjoint(_UNCERTAINTY_WORDS) or any(phrase in text for phrase in _UNCERTAINTY_PHRASES)
         }
         
         return context
     
     def _assess_urgency(self, text: str, primary_intent: str) -> str:
         """Assess urgency level of the message"""
-        # High urgency indicators
-        high_urgency_words = [
-            'urgent', 'emergency', 'crisis', 'help', 'now', 'immediately',
-            'can\'t take it', 'breaking down', 'falling apart'
-        ]
-        
         # Crisis intent is always high urgency
         if primary_intent == 'crisis':
             return 'high'
         
         # Check for high urgency words
-        if any(word in text for word in high_urgency_words):
+        if _HIGH_URGENCY_SCAN.search(text):
             return 'high'
         
         # Medium urgency for certain intents
-        medium_urgency_intents = ['depression', 'anxiety', 'professional_help']
-        if primary_intent in medium_urgency_intents:
+        if primary_intent in _MEDIUM_URGENCY_INTENTS:
             return 'medium'
         
         return 'low'
     
-    def _load_or_train_model(self):
-        """Load existing ML model or train a new one"""
-        if os.path.exists(self.model_path):
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _load_or_train_model(cls, model_path: str) -> Tuple[Any, Any]:
+        """Load existing ML model or train a new one, once per model path"""
+        if os.path.exists(model_path):
             try:
-                model_data = joblib.load(self.model_path)
-                self.ml_model = model_data['model']
-                self.vectorizer = model_data['vectorizer']
+                # Uncompressed dumps let joblib map the arrays instead of copying them
+                model_data = joblib.load(model_path, mmap_mode='r')
                 print("Loaded existing intent classification model")
+                return model_data['model'], model_data['vectorizer']
             except Exception as e:
                 print(f"Error loading model: {e}")
-                self._train_new_model()
-        else:
-            self._train_new_model()
+        
+        print(f"Training intent classification model, it will be saved to {model_path}")
+        return cls._train_new_model(model_path)
+    
+    def retrain(self):
+        """Retrain the intent classifier, save it and use it for this and future detectors"""
+        self.ml_model, self.vectorizer = self._train_new_model(self.model_path)
+        self._load_or_train_model.cache_clear()
+        if self.ml_model is not None:
+            self._index_ml_classes()
+            self._detect_intent_cached.cache_clear()
     
-    def _train_new_model(self):
+    @classmethod
+    def _train_new_model(cls, model_path: str) -> Tuple[Any, Any]:
         """Train a new intent classification model"""
         # Sample training data (in a real application, this would be much larger)
         training_data = [
@@ -285,25 +395,36 @@ class IntentDetector:
             texts, labels = zip(*training_data)
             
             # Create pipeline
-            self.vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-            self.ml_model = MultinomialNB()
+            vectorizer = TfidfVectorizer(max_features=1000, stop_words='english', dtype=np.float32)
+            ml_model = MultinomialNB()
             
             # Train model
-            X = self.vectorizer.fit_transform(texts)
-            self.ml_model.fit(X, labels)
+            X = vectorizer.fit_transform(texts)
+            ml_model.fit(X, labels)
+            
+            # Single precision is plenty for ranking intents and halves the stored weights
+            ml_model.feature_log_prob_ = ml_model.feature_log_prob_.astype(np.float32)
+            ml_model.class_log_prior_ = ml_model.class_log_prior_.astype(np.float32)
             
             # Save model
-            os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
+            os.makedirs(os.path.dirname(model_path), exist_ok=True)
             joblib.dump({
-                'model': self.ml_model,
-                'vectorizer': self.vectorizer
-            }, self.model_path)
+                'model': ml_model,
+                'vectorizer': vectorizer
+            }, model_path, compress=0, protocol=5)
             
             print("Trained new intent classification model")
+            return ml_model, vectorizer
         except Exception as e:
             print(f"Error training model: {e}")
-            self.ml_model = None
-            self.vectorizer = None
+            return None, None
+    
+    def _index_ml_classes(self):
+        """Map ML model classes onto intent ids and cache the Naive Bayes parameters"""
+        self._ml_class_positions = np.array([self._intent_index[name] for name in self.ml_model.classes_])
+        # Models saved before weights were stored in float32 are cast on load
+        self._nb_feature_log_prob = self.ml_model.feature_log_prob_.T.astype(np.float32, copy=False)
+        self._nb_class_log_prior = self.ml_model.class_log_prior_.astype(np.float32, copy=False)
     
     def get_intent_response_template(self, intent: str) -> str:
         """Get response template for detected intent"""
@@ -0,0 +1,66 @@
+"""
+Keyword Tables - Shared phrase lists for crisis and mental health detection
+"""
+
+# Crisis language, grouped the way intent detection scores it (one pattern per group)
+CRISIS_PHRASE_GROUPS = [
+    ['kill myself', 'suicide', 'end it all', 'not worth living'],
+    ['hurt myself', 'self harm', 'cut myself', 'overdose'],
+    ['jump off', 'hang myself', 'die', 'death', 'dead'],
+    ['better off dead', 'want to die', 'end my life']
+]
+
+# Single words that suggest crisis in context but are too broad to raise risk alone
+CRISIS_BROAD_WORDS = frozenset({'die', 'death', 'dead'})
+
+CRISIS_PHRASES = [phrase for group in CRISIS_PHRASE_GROUPS for phrase in group]
+CRISIS_EXPLICIT_PHRASES = [phrase for phrase in CRISIS_PHRASES if phrase not in CRISIS_BROAD_WORDS]
+
+# Mental health keywords by category
+MENTAL_HEALTH_KEYWORDS = {
+    'depression': [
+        'depressed', 'depression', 'sad', 'hopeless', 'worthless', 'empty',
+        'guilty', 'shame', 'suicidal', 'death', 'die', 'kill myself'
+    ],
+    'anxiety': [
+        'anxious', 'anxiety', 'worried', 'worry', 'panic', 'nervous',
+        'stressed', 'stress', 'overwhelmed', 'fear', 'afraid', 'scared'
+    ],
+    'bipolar': [
+        'manic', 'mania', 'high', 'euphoric', 'energetic', 'irritable',
+        'mood swings', 'bipolar', 'cycling'
+    ],
+    'ptsd': [
+        'trauma', 'flashback', 'nightmare', 'triggered', 'ptsd', 'post traumatic',
+        'memories', 'avoiding', 'hypervigilant'
+    ],
+    'eating_disorder': [
+        'anorexia', 'bulimia', 'binge', 'purge', 'body image', 'weight',
+        'eating disorder', 'food', 'diet', 'starving'
+    ],
+    'substance_abuse': [
+        'alcohol', 'drugs', 'addiction', 'substance', 'drinking', 'smoking',
+        'overdose', 'withdrawal', 'rehab'
+    ]
+}
+
+# Phrases counted towards each mental health indicator
+MENTAL_HEALTH_INDICATOR_PHRASES = {
+    'crisis_indicators': CRISIS_EXPLICIT_PHRASES,
+    'support_seeking': [
+        'need help', 'can\'t cope', 'don\'t know what to do', 'feeling lost',
+        'need support', 'reaching out', 'cry for help'
+    ],
+    'coping_mechanisms': [
+        'meditation', 'breathing', 'exercise', 'therapy', 'counseling',
+        'talking to someone', 'journaling', 'mindfulness'
+    ],
+    'social_indicators': [
+        'lonely', 'isolated', 'alone', 'no friends', 'social anxiety',
+        'avoiding people', 'withdrawn'
+    ],
+    'physical_symptoms': [
+        'headache', 'stomach ache', 'tired', 'exhausted', 'sleep problems',
+        'appetite', 'weight loss', 'weight gain', 'pain'
+    ]
+}
@@ -2,109 +2,366 @@
 Sentiment Analysis Module - Analyzes emotional tone and sentiment
 """
 
+import copy
 import os
 import re
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from typing import Dict, List, Any, Tuple
 from textblob import TextBlob
 import spacy
-from transformers import pipeline
+from transformers import AutoTokenizer, pipeline
 import torch
+import ahocorasick
+import numpy as np
+from src.nlp.keywords import MENTAL_HEALTH_KEYWORDS, MENTAL_HEALTH_INDICATOR_PHRASES
+
+# Opt-in dynamic int8 quantization of the transformer Linear layers on CPU (shifts model scores slightly)
+SENTIMENT_QUANTIZE = os.environ.get('SENTIMENT_QUANTIZE', 'false').lower() in ['true', 'on', '1']
+
+# Optional torch.compile of the transformer models (slow first call, faster steady state)
+SENTIMENT_TORCH_COMPILE = os.environ.get('SENTIMENT_TORCH_COMPILE', 'false').lower() in ['true', 'on', '1']
+
+# Intra-op threads per process; several gunicorn workers share the host's cores
+TORCH_NUM_THREADS = int(os.environ.get('TORCH_NUM_THREADS', str(max(1, (os.cpu_count() or 2) // 2))))
+
+def _build_classification_pipeline(task: str, model_name: str):
+    """Build a HuggingFace pipeline in reduced precision for the available device"""
+    # Rust-backed tokenizer, loaded once and pinned to the pipeline
+    tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True, clean_up_tokenization_spaces=True)
+    if torch.cuda.is_available():
+        # Half precision halves weight bandwidth on GPU
+        classifier = pipeline(task, model=model_name, tokenizer=tokenizer, framework='pt',
+                              return_all_scores=True, device=0, torch_dtype=torch.float16)
+    else:
+        torch.set_num_threads(TORCH_NUM_THREADS)
+        classifier = pipeline(task, model=model_name, tokenizer=tokenizer, framework='pt',
+                              return_all_scores=True, device=-1)
+        if SENTIMENT_QUANTIZE:
+            classifier.model = torch.quantization.quantize_dynamic(classifier.model, {torch.nn.Linear}, dtype=torch.qint8)
+    
+    classifier.model.eval()
+    if SENTIMENT_TORCH_COMPILE and hasattr(torch, 'compile'):
+        classifier.model = torch.compile(classifier.model, fullgraph=False)
+    return classifier
+
+# Texts without a single letter (empty, whitespace, punctuation, digits) carry no signal for a transformer pass
+_HAS_LETTER = re.compile(r'[^\W\d_]')
+
+# Opt-in vectorized lexicon lookup in place of TextBlob (same lexicon, ignores punctuation emphasis)
+SENTIMENT_FAST_LEXICON = os.environ.get('SENTIMENT_FAST_LEXICON', 'false').lower() in ['true', 'on', '1']
+
+_LEXICON_TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+_NEGATION_TOKENS = frozenset({'no', 'not', 'never'})
+
+class _PolarityLexicon:
+    """Vectorized polarity and subjectivity lookup over TextBlob's pattern lexicon"""
+    
+    def __init__(self, lexicon):
+        words = list(lexicon)
+        self.index = {word: i for i, word in enumerate(words)}
+        # The None entry holds each word's scores averaged over its parts of speech
+        scores = np.array([lexicon[word][None][:3] for word in words], dtype=np.float32)
+        self.polarity, self.subjectivity, self.intensity = scores.T
+        self.is_modifier = np.array(['RB' in lexicon[word] for word in words])
+    
+    def score(self, text: str) -> Tuple[float, float]:
+        """Return (polarity, subjectivity) for text, mirroring TextBlob's averaging"""
+        tokens = _LEXICON_TOKEN_PATTERN.findall(text.lower())
+        positions = [i for i, token in enumerate(tokens) if token in self.index]
+        if not positions:
+            return 0.0, 0.0
+        
+        ids = np.fromiter((self.index[tokens[i]] for i in positions), dtype=np.intp, count=len(positions))
+        negated = np.fromiter(
+            (i > 0 and (tokens[i - 1] in _NEGATION_TOKENS or tokens[i - 1].endswith("n't")) for i in positions),
+            dtype=bool, count=len(positions)
+        )
+        
+        # Adverbs such as 'very' scale the word right after them instead of scoring on their own
+        modifies_next = (np.diff(positions) == 1) & self.is_modifier[ids[:-1]]
+        scale = np.ones(len(positions), dtype=np.float32)
+        scale[1:][modifies_next] = self.intensity[ids[:-1]][modifies_next]
+        negated[1:] |= modifies_next & negated[:-1]
+        keep = np.ones(len(positions), dtype=bool)
+        keep[:-1][modifies_next] = False
+        
+        polarity = np.clip(np.where(negated, -0.5, 1.0) * scale * self.polarity[ids], -1.0, 1.0)
+        subjectivity = np.clip(scale * self.subjectivity[ids], 0.0, 1.0)
+        return float(polarity[keep].mean()), float(subjectivity[keep].mean())
+
+def _load_polarity_lexicon():
+    """Build the polarity lexicon, or None to fall back to TextBlob"""
+    try:
+        from textblob.en import sentiment as pattern_lexicon
+        pattern_lexicon.load()
+        return _PolarityLexicon(pattern_lexicon)
+    except Exception as e:
+        print(f"Warning: Could not load polarity lexicon, using TextBlob: {e}")
+        return None
+
+def _load_spacy():
+    """Load the spaCy English model, or None if it is not installed"""
+    try:
+        # Only noun chunks and entities are used; noun chunks still need the tagger's POS tags
+        return spacy.load("en_core_web_sm", disable=["lemmatizer"])
+    except OSError:
+        print("Warning: spaCy English model not found. Install with: python -m spacy download en_core_web_sm")
+        return None
+
+def _load_sentiment_pipeline():
+    """Load the HuggingFace sentiment pipeline, or None on failure"""
+    try:
+        return _build_classification_pipeline(
+            "sentiment-analysis",
+            "cardiffnlp/twitter-roberta-base-sentiment-latest"
+        )
+    except Exception as e:
+        print(f"Warning: Could not load HuggingFace models: {e}")
+        return None
+
+def _load_emotion_pipeline():
+    """Load the HuggingFace emotion pipeline, or None on failure"""
+    try:
+        return _build_classification_pipeline(
+            "text-classification",
+            "j-hartmann/emotion-english-distilroberta-base"
+        )
+    except Exception as e:
+        print(f"Warning: Could not load HuggingFace models: {e}")
+        return None
+
+class _BatchDispatcher:
+    """Coalesces texts from concurrent requests into shared pipeline forward passes"""
+    
+    def __init__(self, classifier, max_batch_size: int, max_wait_ms: float):
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+    
+    def __call__(self, texts: List[str]) -> List[Any]:
+        """Classify texts, blocking until their batches have run"""
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((text, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+    
+    def _run(self):
+        """Drain up to max_batch_size queued texts, waiting at most max_wait for stragglers"""
+        while True:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(items) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            texts = [text for text, _ in items]
+            try:
+                # Grad mode is per thread, so disable autograd here in the worker
+                with torch.inference_mode():
+                    results = self.classifier(texts, batch_size=len(texts), truncation=True)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future), result in zip(items, results):
+                future.set_result(result)
+
+# Heavy models are loaded on first use and shared by every analyzer instance
+_shared_models = {}
+_shared_models_lock = threading.RLock()
+
+def _get_shared_model(name: str, loader):
+    """Get a shared model, loading it once across all threads"""
+    if name not in _shared_models:
+        with _shared_models_lock:
+            if name not in _shared_models:
+                _shared_models[name] = loader()
+    return _shared_models[name]
 
 class SentimentAnalyzer:
     """Advanced sentiment analysis for mental health conversations"""
     
     def __init__(self):
         """Initialize sentiment analyzer"""
-        self.nlp = None
-        self.sentiment_pipeline = None
-        self.emotion_pipeline = None
-        
-        # Initialize spaCy model
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            print("Warning: spaCy English model not found. Install with: python -m spacy download en_core_web_sm")
-        
-        # Initialize HuggingFace pipelines
-        try:
-            self.sentiment_pipeline = pipeline(
-                "sentiment-analysis",
-                model="cardiffnlp/twitter-roberta-base-sentiment-latest",
-                return_all_scores=True
-            )
-            self.emotion_pipeline = pipeline(
-                "text-classification",
-                model="j-hartmann/emotion-english-distilroberta-base",
-                return_all_scores=True
-            )
-        except Exception as e:
-            print(f"Warning: Could not load HuggingFace models: {e}")
+        self.batch_size = int(os.environ.get('SENTIMENT_BATCH_SIZE', '32'))
+        self.batch_wait_ms = float(os.environ.get('SENTIMENT_BATCH_WAIT_MS', '5'))
+        
+        # LRU cache of full analyses keyed by raw text
+        self.cache_size = int(os.environ.get('SENTIMENT_CACHE_SIZE', '4096'))
+        self._analysis_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Single automaton over every keyword and indicator phrase
+        self._phrase_automaton = ahocorasick.Automaton()
+        for phrase_groups in (MENTAL_HEALTH_KEYWORDS, MENTAL_HEALTH_INDICATOR_PHRASES):
+            for phrases in phrase_groups.values():
+                for phrase in phrases:
+                    self._phrase_automaton.add_word(phrase, phrase)
+        self._phrase_automaton.make_automaton()
+    
+    @property
+    def nlp(self):
+        """Shared spaCy model, loaded on first use"""
+        return _get_shared_model('spacy', _load_spacy)
+    
+    @property
+    def sentiment_pipeline(self):
+        """Shared HuggingFace sentiment pipeline, loaded on first use"""
+        return _get_shared_model('sentiment', _load_sentiment_pipeline)
+    
+    @property
+    def emotion_pipeline(self):
+        """Shared HuggingFace emotion pipeline, loaded on first use"""
+        return _get_shared_model('emotion', _load_emotion_pipeline)
+    
+    def _sentiment_dispatcher(self) -> _BatchDispatcher:
+        """Shared batching front end for the sentiment pipeline"""
+        return _get_shared_model('sentiment_dispatcher', lambda: _BatchDispatcher(
+            self.sentiment_pipeline, self.batch_size, self.batch_wait_ms
+        ))
+    
+    def _emotion_dispatcher(self) -> _BatchDispatcher:
+        """Shared batching front end for the emotion pipeline"""
+        return _get_shared_model('emotion_dispatcher', lambda: _BatchDispatcher(
+            self.emotion_pipeline, self.batch_size, self.batch_wait_ms
+        ))
+    
+    def warm_up(self):
+        """Load every shared model and run one pass through each, bypassing the result cache"""
+        self._analyze_uncached(['Warming up the sentiment models today.'])
+        self.extract_key_phrases_batch(['Warming up the language model.'])
     
     def analyze_sentiment(self, text: str) -> Dict[str, Any]:
         """Comprehensive sentiment analysis"""
-        # Basic TextBlob analysis
-        blob = TextBlob(text)
-        polarity = blob.sentiment.polarity
-        subjectivity = blob.sentiment.subjectivity
-        
-        # Convert polarity to sentiment label
-        if polarity > 0.1:
-            sentiment_label = 'positive'
-        elif polarity < -0.1:
-            sentiment_label = 'negative'
-        else:
-            sentiment_label = 'neutral'
-        
-        # Advanced analysis with HuggingFace models
-        advanced_sentiment = self._analyze_advanced_sentiment(text)
-        emotions = self._analyze_emotions(text)
-        mental_health_indicators = self._analyze_mental_health_indicators(text)
-        
-        return {
-            'text': text,
-            'polarity': polarity,
-            'subjectivity': subjectivity,
-            'sentiment_label': sentiment_label,
-            'confidence': abs(polarity),
-            'advanced_sentiment': advanced_sentiment,
-            'emotions': emotions,
-            'mental_health_indicators': mental_health_indicators,
-            'risk_level': self._assess_risk_level(text, polarity, emotions, mental_health_indicators)
-        }
+        return self.analyze_sentiments([text])[0]
+    
+    def analyze_sentiments(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Comprehensive sentiment analysis for a batch of texts"""
+        analyses = {}
+        with self._cache_lock:
+            for text in texts:
+                if text in self._analysis_cache:
+                    self._analysis_cache.move_to_end(text)
+                    analyses[text] = self._analysis_cache[text]
+        
+        # Only texts not seen recently go through the models
+        missing = [text for text in dict.fromkeys(texts) if text not in analyses]
+        if missing:
+            new_analyses = dict(zip(missing, self._analyze_uncached(missing)))
+            analyses.update(new_analyses)
+            with self._cache_lock:
+                self._analysis_cache.update(new_analyses)
+                while len(self._analysis_cache) > self.cache_size:
+                    self._analysis_cache.popitem(last=False)
+        
+        # Cached results are shared between calls, so each caller gets its own copy
+        return [copy.deepcopy(analyses[text]) for text in texts]
+    
+    def _analyze_uncached(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Run the full analysis for a batch of texts without consulting the cache"""
+        indicators_batch = [self._analyze_mental_health_indicators(text) for text in texts]
+        
+        # Crisis language already makes the risk high and texts without letters carry no signal,
+        # so both skip the transformers; their model fields are None and marked 'skipped'
+        model_texts = [
+            text for text, indicators in zip(texts, indicators_batch)
+            if not indicators['crisis_indicators'] and _HAS_LETTER.search(text)
+        ]
+        advanced_sentiments = {}
+        emotions_by_text = {}
+        if model_texts:
+            # Advanced analysis with HuggingFace models, one forward pass per batch
+            advanced_sentiments = dict(zip(model_texts, self._analyze_advanced_sentiment_batch(model_texts)))
+            emotions_by_text = dict(zip(model_texts, self._analyze_emotions_batch(model_texts)))
+        
+        results = []
+        for text, mental_health_indicators in zip(texts, indicators_batch):
+            if text in advanced_sentiments:
+                advanced_sentiment = advanced_sentiments[text]
+                emotions = emotions_by_text[text]
+            else:
+                advanced_sentiment = {'label': None, 'score': None, 'skipped': True}
+                emotions = {'primary_emotion': None, 'confidence': None, 'skipped': True}
+            
+            # Basic lexicon polarity
+            polarity, subjectivity = self._score_polarity(text)
+            
+            # Convert polarity to sentiment label
+            if polarity > 0.1:
+                sentiment_label = 'positive'
+            elif polarity < -0.1:
+                sentiment_label = 'negative'
+            else:
+                sentiment_label = 'neutral'
+            
+            results.append({
+                'text': text,
+                'polarity': polarity,
+                'subjectivity': subjectivity,
+                'sentiment_label': sentiment_label,
+                'confidence': abs(polarity),
+                'advanced_sentiment': advanced_sentiment,
+                'emotions': emotions,
+                'mental_health_indicators': mental_health_indicators,
+                'risk_level': self._assess_risk_level(text, polarity, emotions, mental_health_indicators)
+            })
+        
+        return results
+    
+    def _score_polarity(self, text: str) -> Tuple[float, float]:
+        """Polarity and subjectivity from TextBlob, or the shared lexicon when SENTIMENT_FAST_LEXICON is set"""
+        lexicon = _get_shared_model('lexicon', _load_polarity_lexicon) if SENTIMENT_FAST_LEXICON else None
+        if lexicon is None:
+            blob = TextBlob(text)
+            return blob.sentiment.polarity, blob.sentiment.subjectivity
+        return lexicon.score(text)
     
     def analyze_conversation_sentiment(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
         """Analyze sentiment trends across a conversation"""
         if not messages:
             return {'overall_sentiment': 'neutral', 'trend': 'stable', 'risk_level': 'low'}
         
-        sentiments = []
-        emotions_over_time = []
+        user_texts = [message.get('content', '') for message in messages if message.get('sender') == 'user']
+        if not user_texts:
+            return {'overall_sentiment': 'neutral', 'trend': 'stable', 'risk_level': 'low'}
         
-        for message in messages:
-            if message.get('sender') == 'user':
-                sentiment = self.analyze_sentiment(message.get('content', ''))
-                sentiments.append(sentiment)
-                emotions_over_time.append(sentiment.get('emotions', {}))
+        sentiments = self.analyze_sentiments(user_texts)
+        emotions_over_time = [sentiment.get('emotions', {}) for sentiment in sentiments]
         
-        if not sentiments:
-            return {'overall_sentiment': 'neutral', 'trend': 'stable', 'risk_level': 'low'}
+        polarities = np.fromiter((s['polarity'] for s in sentiments), dtype=np.float64, count=len(sentiments))
+        subjectivities = np.fromiter((s['subjectivity'] for s in sentiments), dtype=np.float64, count=len(sentiments))
         
         # Calculate overall sentiment
-        avg_polarity = sum(s['polarity'] for s in sentiments) / len(sentiments)
-        avg_subjectivity = sum(s['subjectivity'] for s in sentiments) / len(sentiments)
+        avg_polarity = float(polarities.mean())
+        avg_subjectivity = float(subjectivities.mean())
         
         # Determine trend
-        if len(sentiments) >= 3:
-            recent_polarity = sum(s['polarity'] for s in sentiments[-3:]) / 3
-            earlier_polarity = sum(s['polarity'] for s in sentiments[:-3]) / len(sentiments[:-3]) if len(sentiments) > 3 else recent_polarity
+        if polarities.size >= 3:
+            recent_polarity = polarities[-3:].mean()
+            earlier_polarity = polarities[:-3].mean() if polarities.size > 3 else recent_polarity
             trend = 'improving' if recent_polarity > earlier_polarity + 0.1 else 'declining' if recent_polarity < earlier_polarity - 0.1 else 'stable'
         else:
             trend = 'stable'
         
         # Calculate risk level
         risk_levels = [s['risk_level'] for s in sentiments]
-        high_risk_count = sum(1 for level in risk_levels if level == 'high')
-        medium_risk_count = sum(1 for level in risk_levels if level == 'medium')
+        high_risk_count = risk_levels.count('high')
+        medium_risk_count = risk_levels.count('medium')
         
         if high_risk_count > 0:
             overall_risk = 'high'
@@ -125,51 +382,11 @@ class SentimentAnalyzer:
     
     def detect_mental_health_keywords(self, text: str) -> Dict[str, Any]:
         """Detect mental health related keywords and phrases"""
-        # Mental health keywords by category
-        depression_keywords = [
-            'depressed', 'depression', 'sad', 'hopeless', 'worthless', 'empty',
-            'guilty', 'shame', 'suicidal', 'death', 'die', 'kill myself'
-        ]
-        
-        anxiety_keywords = [
-            'anxious', 'anxiety', 'worried', 'worry', 'panic', 'nervous',
-            'stressed', 'stress', 'overwhelmed', 'fear', 'afraid', 'scared'
-        ]
-        
-        bipolar_keywords = [
-            'manic', 'mania', 'high', 'euphoric', 'energetic', 'irritable',
-            'mood swings', 'bipolar', 'cycling'
-        ]
-        
-        ptsd_keywords = [
-            'trauma', 'flashback', 'nightmare', 'triggered', 'ptsd', 'post traumatic',
-            'memories', 'avoiding', 'hypervigilant'
-        ]
-        
-        eating_disorder_keywords = [
-            'anorexia', 'bulimia', 'binge', 'purge', 'body image', 'weight',
-            'eating disorder', 'food', 'diet', 'starving'
-        ]
-        
-        substance_abuse_keywords = [
-            'alcohol', 'drugs', 'addiction', 'substance', 'drinking', 'smoking',
-            'overdose', 'withdrawal', 'rehab'
-        ]
-        
-        categories = {
-            'depression': depression_keywords,
-            'anxiety': anxiety_keywords,
-            'bipolar': bipolar_keywords,
-            'ptsd': ptsd_keywords,
-            'eating_disorder': eating_disorder_keywords,
-            'substance_abuse': substance_abuse_keywords
-        }
-        
-        text_lower = text.lower()
+        found_phrases = self._find_phrases(text.lower())
         detected_categories = {}
         
-        for category, keywords in categories.items():
-            found_keywords = [kw for kw in keywords if kw in text_lower]
+        for category, keywords in MENTAL_HEALTH_KEYWORDS.items():
+            found_keywords = [kw for kw in keywords if kw in found_phrases]
             if found_keywords:
                 detected_categories[category] = {
                     'keywords': found_keywords,
@@ -183,94 +400,74 @@ class SentimentAnalyzer:
             'has_mental_health_content': len(detected_categories) > 0
         }
     
+    def _find_phrases(self, text_lower: str) -> set:
+        """Find every known keyword or indicator phrase contained in the text"""
+        return {phrase for _, phrase in self._phrase_automaton.iter(text_lower)}
+    
     def _analyze_advanced_sentiment(self, text: str) -> Dict[str, Any]:
         """Advanced sentiment analysis using HuggingFace models"""
+        return self._analyze_advanced_sentiment_batch([text])[0]
+    
+    def _analyze_advanced_sentiment_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Advanced sentiment analysis for a batch of texts in one pipeline call"""
+        default = {'label': 'neutral', 'score': 0.5}
         if not self.sentiment_pipeline:
-            return {'label': 'neutral', 'score': 0.5}
+            return [dict(default) for _ in texts]
         
         try:
-            results = self.sentiment_pipeline(text)
-            if results and len(results) > 0:
-                # Get the highest scoring sentiment
-                best_result = max(results[0], key=lambda x: x['score'])
-                return {
-                    'label': best_result['label'],
-                    'score': best_result['score'],
-                    'all_scores': results[0]
-                }
+            results = self._sentiment_dispatcher()(texts)
+            if results and len(results) == len(texts):
+                analyses = []
+                for scores in results:
+                    # Get the highest scoring sentiment
+                    best_result = max(scores, key=lambda x: x['score'])
+                    analyses.append({
+                        'label': best_result['label'],
+                        'score': best_result['score'],
+                        'all_scores': scores
+                    })
+                return analyses
         except Exception as e:
             print(f"Error in advanced sentiment analysis: {e}")
         
-        return {'label': 'neutral', 'score': 0.5}
+        return [dict(default) for _ in texts]
     
     def _analyze_emotions(self, text: str) -> Dict[str, Any]:
         """Analyze emotions in text"""
+        return self._analyze_emotions_batch([text])[0]
+    
+    def _analyze_emotions_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Analyze emotions for a batch of texts in one pipeline call"""
+        default = {'primary_emotion': 'neutral', 'confidence': 0.5}
         if not self.emotion_pipeline:
-            return {'primary_emotion': 'neutral', 'confidence': 0.5}
+            return [dict(default) for _ in texts]
         
         try:
-            results = self.emotion_pipeline(text)
-            if results and len(results) > 0:
-                # Get the highest scoring emotion
-                best_result = max(results[0], key=lambda x: x['score'])
-                return {
-                    'primary_emotion': best_result['label'],
-                    'confidence': best_result['score'],
-                    'all_emotions': results[0]
-                }
+            results = self._emotion_dispatcher()(texts)
+            if results and len(results) == len(texts):
+                analyses = []
+                for scores in results:
+                    # Get the highest scoring emotion
+                    best_result = max(scores, key=lambda x: x['score'])
+                    analyses.append({
+                        'primary_emotion': best_result['label'],
+                        'confidence': best_result['score'],
+                        'all_emotions': scores
+                    })
+                return analyses
         except Exception as e:
             print(f"Error in emotion analysis: {e}")
         
-        return {'primary_emotion': 'neutral', 'confidence': 0.5}
+        return [dict(default) for _ in texts]
     
     def _analyze_mental_health_indicators(self, text: str) -> Dict[str, Any]:
         """Analyze specific mental health indicators"""
-        indicators = {
-            'crisis_indicators': 0,
-            'support_seeking': 0,
-            'coping_mechanisms': 0,
-            'social_indicators': 0,
-            'physical_symptoms': 0
-        }
-        
-        text_lower = text.lower()
-        
-        # Crisis indicators
-        crisis_phrases = [
-            'kill myself', 'end it all', 'not worth living', 'better off dead',
-            'hurt myself', 'suicide', 'overdose', 'jump off', 'hang myself'
-        ]
-        indicators['crisis_indicators'] = sum(1 for phrase in crisis_phrases if phrase in text_lower)
-        
-        # Support seeking
-        support_phrases = [
-            'need help', 'can\'t cope', 'don\'t know what to do', 'feeling lost',
-            'need support', 'reaching out', 'cry for help'
-        ]
-        indicators['support_seeking'] = sum(1 for phrase in support_phrases if phrase in text_lower)
-        
-        # Coping mechanisms
-        coping_phrases = [
-            'meditation', 'breathing', 'exercise', 'therapy', 'counseling',
-            'talking to someone', 'journaling', 'mindfulness'
-        ]
-        indicators['coping_mechanisms'] = sum(1 for phrase in coping_phrases if phrase in text_lower)
+        found_phrases = self._find_phrases(text.lower())
         
-        # Social indicators
-        social_phrases = [
-            'lonely', 'isolated', 'alone', 'no friends', 'social anxiety',
-            'avoiding people', 'withdrawn'
-        ]
-        indicators['social_indicators'] = sum(1 for phrase in social_phrases if phrase in text_lower)
-        
-        # Physical symptoms
-        physical_phrases = [
-            'headache', 'stomach ache', 'tired', 'exhausted', 'sleep problems',
-            'appetite', 'weight loss', 'weight gain', 'pain'
-        ]
-        indicators['physical_symptoms'] = sum(1 for phrase in physical_phrases if phrase in text_lower)
-        
-        return indicators
+        return {
+            indicator: sum(1 for phrase in phrases if phrase in found_phrases)
+            for indicator, phrases in MENTAL_HEALTH_INDICATOR_PHRASES.items()
+        }
     
     def _assess_risk_level(self, text: str, polarity: float, emotions: Dict, indicators: Dict) -> str:
         """Assess overall risk level based on multiple factors"""
@@ -312,27 +509,34 @@ class SentimentAnalyzer:
     
     def extract_key_phrases(self, text: str) -> List[str]:
         """Extract key phrases from text using spaCy"""
+        return self.extract_key_phrases_batch([text])[0]
+    
+    def extract_key_phrases_batch(self, texts: List[str]) -> List[List[str]]:
+        """Extract key phrases from a batch of texts with one spaCy pipe"""
         if not self.nlp:
-            return []
+            return [[] for _ in texts]
         
         try:
-            doc = self.nlp(text)
-            phrases = []
-            
-            # Extract noun phrases
-            for chunk in doc.noun_chunks:
-                if len(chunk.text.split()) > 1:  # Multi-word phrases
-                    phrases.append(chunk.text)
-            
-            # Extract named entities
-            for ent in doc.ents:
-                if ent.label_ in ['PERSON', 'ORG', 'GPE', 'EVENT']:
-                    phrases.append(ent.text)
+            phrases_batch = []
+            for doc in self.nlp.pipe(texts, batch_size=64):
+                phrases = []
+                
+                # Extract noun phrases
+                for chunk in doc.noun_chunks:
+                    if len(chunk.text.split()) > 1:  # Multi-word phrases
+                        phrases.append(chunk.text)
+                
+                # Extract named entities
+                for ent in doc.ents:
+                    if ent.label_ in ['PERSON', 'ORG', 'GPE', 'EVENT']:
+                        phrases.append(ent.text)
+                
+                phrases_batch.append(list(set(phrases)))  # Remove duplicates
             
-            return list(set(phrases))  # Remove duplicates
+            return phrases_batch
         except Exception as e:
             print(f"Error extracting key phrases: {e}")
-            return []
+            return [[] for _ in texts]
     
     def get_sentiment_summary(self, text: str) -> str:
         """Get a human-readable sentiment summary"""
@@ -352,7 +556,7 @@ class SentimentAnalyzer:
             summary_parts.append(f"The text shows {sentiment} sentiment (moderate confidence)")
         
         # Emotions
-        if emotions.get('confidence', 0) > 0.6:
+        if (emotions.get('confidence') or 0) > 0.6:
             summary_parts.append(f"Primary emotion detected: {emotions['primary_emotion']}")
         
         # Risk level
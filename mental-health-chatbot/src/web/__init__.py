@@ -2,7 +2,22 @@
 Web Module - Flask web application
 """
 
-from .app import create_app
-from .config import Config
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ['create_app', 'Config']
\ No newline at end of file
+if TYPE_CHECKING:
+    from .app import create_app
+    from .config import Config
+
+__all__ = ['create_app', 'Config']
+
+_LAZY_ATTRIBUTES = {
+    'create_app': '.app',
+    'Config': '.config'
+}
+
+def __getattr__(name):
+    """Import the app factory and config on first access"""
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,40 +3,250 @@ Flask Application Factory
 """
 
 import os
-from flask import Flask
+import logging
+import logging.handlers
+import re
+import time
+import hashlib
+import importlib
+import threading
+from datetime import datetime
+from flask import Flask, render_template, g, request, has_request_context
+from flask.json.provider import DefaultJSONProvider
+from flask.logging import default_handler
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import make_transient_to_detached
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from flask_cors import CORS
 from flask_mail import Mail
+from flask_caching import Cache
+from flask_session import Session
+import redis
+from cachetools import TTLCache
+import orjson
+from jwt.exceptions import DecodeError
 from src.web.config import config
 from src.db.database import db
+from src.db.models import User, MoodEntry
+
+# Three base64url segments; anything else cannot be a signed JWT
+_JWT_STRUCTURE = re.compile(r'^[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*$')
+
+class CachingJWTManager(JWTManager):
+    """JWTManager that remembers verified tokens so reused bearer tokens skip signature checks"""
+    
+    def __init__(self, *args, cache_size: int = 10000, cache_ttl: int = 60, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._decoded_tokens = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._decoded_tokens_lock = threading.Lock()
+    
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        # Reject malformed tokens before any base64 decoding or signature work
+        if not _JWT_STRUCTURE.match(encoded_token):
+            raise DecodeError('Not enough segments or invalid characters')
+        
+        # Cookie tokens carry a per-request CSRF check, so only plain bearer tokens are cached
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        
+        token_hash = hashlib.sha256(encoded_token.encode()).hexdigest()[:32]
+        with self._decoded_tokens_lock:
+            cached = self._decoded_tokens.get(token_hash)
+        if cached is not None and (cached.get('exp') is None or cached['exp'] > time.time()):
+            return cached
+        
+        # Failures raise here and are never cached
+        decoded = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        with self._decoded_tokens_lock:
+            self._decoded_tokens[token_hash] = decoded
+        return decoded
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider that serializes with orjson, including datetimes and numpy values"""
+    
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        # Hooks such as the session serializer's object_hook need the stdlib decoder
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
 
 # Initialize extensions
 login_manager = LoginManager()
-jwt = JWTManager()
+jwt = CachingJWTManager()
 migrate = Migrate()
 cors = CORS()
 mail = Mail()
+cache = Cache()
+server_session = Session()
+
+# Seconds a user's column values stay in the shared cache
+USER_CACHE_TTL = 60
+
+# Credentials and personal details stay out of the shared cache and load from the database on access
+USER_CACHE_EXCLUDED_COLUMNS = frozenset({'password_hash', 'phone', 'date_of_birth'})
+
+def load_cached_user(user_id):
+    """Load a user into the current session, querying only on a cache miss"""
+    columns = cache.get(f'user:{user_id}')
+    
+    if columns is None:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            columns = {
+                attr.key: getattr(user, attr.key) for attr in sa_inspect(User).column_attrs
+                if attr.key not in USER_CACHE_EXCLUDED_COLUMNS
+            }
+            cache.set(f'user:{user_id}', columns, timeout=USER_CACHE_TTL)
+        return user
+    
+    # Rebuild the row as a clean persistent instance without a SELECT
+    user = User(**columns)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _evict_cached_user(mapper, connection, target):
+    cache.delete(f'user:{target.id}')
+
+# Seconds a user's rendered mood charts stay cached
+MOOD_CHART_TTL = 120
+
+def mood_chart_key(user_id, days):
+    """Cache key for a user's mood charts under their current mood data version"""
+    version = cache.get(f'mood_version:{user_id}') or 0
+    return f'dash:mood:{user_id}:{version}:{days}'
+
+def invalidate_mood_charts(user_id):
+    """Retire every cached mood chart for a user by moving them to a new data version"""
+    cache.set(f'mood_version:{user_id}', time.time_ns(), timeout=0)
+
+@event.listens_for(MoodEntry, 'after_insert')
+@event.listens_for(MoodEntry, 'after_update')
+@event.listens_for(MoodEntry, 'after_delete')
+def _evict_mood_charts(mapper, connection, target):
+    invalidate_mood_charts(target.user_id)
+
+# Blueprint modules under src.web.routes, imported only when an app is created
+BLUEPRINTS = [
+    ('auth', '/auth'),
+    ('chat', '/chat'),
+    ('dashboard', '/dashboard'),
+    ('admin', '/admin'),
+    ('api', '/api')
+]
+
+# Set once this worker's NLP models are loaded
+models_ready = threading.Event()
+
+def warm_up_models():
+    """Load the shared NLP models ahead of the first chat request"""
+    try:
+        # Imported here so loading the app module never pulls in the NLP stack
+        from src.nlp.sentiment_analysis import SentimentAnalyzer
+        SentimentAnalyzer().warm_up()
+    except Exception as e:
+        print(f"Error warming up NLP models: {e}")
+    finally:
+        models_ready.set()
+
+def configure_logging(app):
+    """Send app log records through a buffered stream handler, unbuffered in debug mode"""
+    app.logger.setLevel(logging.DEBUG if app.debug else app.config['LOG_LEVEL'])
+    # Every app created in this process shares the same named logger, so replace an earlier app's handler
+    for handler in [handler for handler in app.logger.handlers if getattr(handler, '_app_stream_handler', False)]:
+        app.logger.removeHandler(handler)
+        handler.close()
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(default_handler.formatter)
+    if app.debug:
+        handler = stream_handler
+    else:
+        # Records are written in batches of 100, or straight away from WARNING up
+        handler = logging.handlers.MemoryHandler(
+            capacity=100, flushLevel=logging.WARNING, target=stream_handler
+        )
+    handler._app_stream_handler = True
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(handler)
+
+def register_query_audit(app):
+    """Count queries per request and report slow statements"""
+    slow_query_seconds = app.config['SLOW_QUERY_MS'] / 1000.0
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_times', []).append(time.monotonic())
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+    
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.monotonic() - conn.info['query_start_times'].pop()
+        if elapsed > slow_query_seconds:
+            app.logger.warning('Slow query (%.0fms): %s', elapsed * 1000, statement)
+    
+    def handle_error(context):
+        # A failed statement never reaches after_cursor_execute, so its start time is dropped here
+        if context.connection is not None:
+            start_times = context.connection.info.get('query_start_times')
+            if start_times:
+                start_times.pop()
+    
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(db.engine, 'handle_error', handle_error)
 
 def create_app(config_name=None):
     """Create and configure Flask application"""
     
     # Create Flask app
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     
     # Load configuration
     config_name = config_name or os.environ.get('FLASK_ENV', 'default')
     app.config.from_object(config[config_name])
     
+    configure_logging(app)
+    
+    # psycopg2 can also batch executemany UPDATE/DELETE into paged round trips
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith(('postgresql://', 'postgresql+psycopg2://')):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            **app.config['SQLALCHEMY_ENGINE_OPTIONS'],
+            'executemany_mode': 'values_plus_batch'
+        }
+    
     # Initialize extensions
     db.init_app(app)
     login_manager.init_app(app)
     jwt.init_app(app)
     migrate.init_app(app, db)
     cors.init_app(app)
-    mail.init_app(app)
+    cache.init_app(app)
+    
+    # Server-side sessions need Redis; without it Flask keeps its signed cookie sessions
+    if app.config.get('SESSION_TYPE') == 'redis':
+        app.config.setdefault('SESSION_REDIS', redis.from_url(app.config['REDIS_URL']))
+        server_session.init_app(app)
+    
+    # Mail can only send with credentials, so skip it when none are configured
+    if app.config.get('MAIL_USERNAME'):
+        mail.init_app(app)
+    
+    if app.config['SQL_AUDIT_ENABLED']:
+        register_query_audit(app)
     
     # Configure login manager
     login_manager.login_view = 'auth.login'
@@ -46,8 +256,7 @@ def create_app(config_name=None):
     # User loader for Flask-Login
     @login_manager.user_loader
     def load_user(user_id):
-        from src.db.models import User
-        return User.query.get(int(user_id))
+        return load_cached_user(int(user_id))
     
     # JWT error handlers
     @jwt.expired_token_loader
@@ -63,48 +272,38 @@ def create_app(config_name=None):
         return {'message': 'Authorization token is required'}, 401
     
     # Register blueprints
-    from src.web.routes.auth import auth_bp
-    from src.web.routes.chat import chat_bp
-    from src.web.routes.dashboard import dashboard_bp
-    from src.web.routes.admin import admin_bp
-    from src.web.routes.api import api_bp
-    
-    app.register_blueprint(auth_bp, url_prefix='/auth')
-    app.register_blueprint(chat_bp, url_prefix='/chat')
-    app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
-    app.register_blueprint(admin_bp, url_prefix='/admin')
-    app.register_blueprint(api_bp, url_prefix='/api')
+    for name, url_prefix in BLUEPRINTS:
+        module = importlib.import_module(f'src.web.routes.{name}')
+        app.register_blueprint(getattr(module, f'{name}_bp'), url_prefix=url_prefix)
+    
+    # create_app runs in each gunicorn worker, so every worker warms its own models
+    if app.config['NLP_WARMUP']:
+        threading.Thread(target=warm_up_models, name='nlp-warmup', daemon=True).start()
     
     # Main routes
     @app.route('/')
     def index():
-        from flask import render_template
         return render_template('index.html')
     
     @app.route('/about')
     def about():
-        from flask import render_template
         return render_template('about.html')
     
     @app.route('/contact')
     def contact():
-        from flask import render_template
         return render_template('contact.html')
     
     @app.route('/features')
     def features():
-        from flask import render_template
         return render_template('features.html')
     
     # Error handlers
     @app.errorhandler(404)
     def not_found_error(error):
-        from flask import render_template
         return render_template('errors/404.html'), 404
     
     @app.errorhandler(500)
     def internal_error(error):
-        from flask import render_template
         db.session.rollback()
         return render_template('errors/500.html'), 500
     
@@ -119,25 +318,24 @@ def create_app(config_name=None):
     # Before request handlers
     @app.before_request
     def before_request():
-        from flask import g, request
-        from datetime import datetime
-        
-        g.request_start_time = datetime.now()
-        
-        # Log request (in production, use proper logging)
-        if app.config['DEBUG']:
-            print(f"Request: {request.method} {request.path}")
+        g.request_start_time = time.perf_counter()
+        app.logger.debug('Request: %s %s', request.method, request.path)
     
     # After request handlers
     @app.after_request
     def after_request(response):
-        from flask import g, request
-        from datetime import datetime
-        
         if hasattr(g, 'request_start_time'):
-            duration = (datetime.now() - g.request_start_time).total_seconds()
-            if app.config['DEBUG']:
-                print(f"Request completed in {duration:.3f}s")
+            duration = time.perf_counter() - g.request_start_time
+            app.logger.debug('Request completed in %.3fs', duration)
+        
+        # Flag endpoints that look like they have an N+1 query pattern
+        query_count = g.get('query_count', 0)
+        budget = app.config['QUERY_BUDGETS'].get(request.endpoint, app.config['QUERY_COUNT_WARNING'])
+        if query_count > budget:
+            app.logger.warning('Request %s %s issued %s queries (budget %s)',
+                               request.method, request.path, query_count, budget)
+            if app.config['QUERY_BUDGET_STRICT']:
+                raise AssertionError(f'{request.endpoint} issued {query_count} queries, budget is {budget}')
         
         return response
     
@@ -148,6 +346,7 @@ def create_app(config_name=None):
             'status': 'healthy',
             'app_name': app.config['APP_NAME'],
             'version': app.config['APP_VERSION'],
+            'models_ready': models_ready.is_set(),
             'timestamp': datetime.now().isoformat()
         }
     
@@ -5,89 +5,153 @@ Flask Application Configuration
 import os
 from datetime import timedelta
 
+def _as_bool(value):
+    return value.lower() in ['true', 'on', '1']
+
+class _EnvSetting:
+    """Config attribute read from the environment when it is accessed; a callable default is evaluated then too"""
+    
+    def __init__(self, name, default=None, cast=None, empty_is_unset=False):
+        self.name = name
+        self.default = default
+        self.cast = cast
+        # A variable set to '' counts as set (e.g. MAIL_USERNAME= disables mail) unless this is on
+        self.empty_is_unset = empty_is_unset
+    
+    def __get__(self, instance, owner):
+        value = os.environ.get(self.name)
+        if value is None or (self.empty_is_unset and not value):
+            value = self.default() if callable(self.default) else self.default
+        if value is None or self.cast is None:
+            return value
+        return self.cast(value)
+
 class Config:
     """Base configuration class"""
     
     # Flask Configuration
-    SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
+    SECRET_KEY = _EnvSetting('SECRET_KEY', 'dev-secret-key-change-in-production', empty_is_unset=True)
+    JWT_SECRET_KEY = _EnvSetting('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production', empty_is_unset=True)
     
     # Database Configuration
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///mental_health_chatbot.db'
+    SQLALCHEMY_DATABASE_URI = _EnvSetting('DATABASE_URL', 'sqlite:///mental_health_chatbot.db', empty_is_unset=True)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', '10')),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '20')),
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+        # Rows per multi-row VALUES statement when an executemany INSERT is batched
+        'insertmanyvalues_page_size': 1000,
+        # Compiled statement cache per engine; the default 500 is too small for every route's queries
+        'query_cache_size': int(os.environ.get('DB_QUERY_CACHE_SIZE', '1200'))
+    }
     
     # JWT Configuration
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
     
     # OpenAI Configuration
-    OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
-    OPENAI_MODEL = os.environ.get('OPENAI_MODEL', 'gpt-4')
-    OPENAI_MAX_TOKENS = int(os.environ.get('OPENAI_MAX_TOKENS', '1000'))
-    OPENAI_TEMPERATURE = float(os.environ.get('OPENAI_TEMPERATURE', '0.7'))
+    OPENAI_API_KEY = _EnvSetting('OPENAI_API_KEY')
+    OPENAI_MODEL = _EnvSetting('OPENAI_MODEL', 'gpt-4')
+    OPENAI_MAX_TOKENS = _EnvSetting('OPENAI_MAX_TOKENS', '1000', cast=int)
+    OPENAI_TEMPERATURE = _EnvSetting('OPENAI_TEMPERATURE', '0.7', cast=float)
+    OPENAI_CONTEXT_TOKENS = _EnvSetting('OPENAI_CONTEXT_TOKENS', '8192', cast=int)
     
     # Pinecone Configuration
-    PINECONE_API_KEY = os.environ.get('PINECONE_API_KEY')
-    PINECONE_ENVIRONMENT = os.environ.get('PINECONE_ENVIRONMENT', 'us-east-1')
-    PINECONE_INDEX_NAME = os.environ.get('PINECONE_INDEX_NAME', 'mental-health-embeddings')
+    PINECONE_API_KEY = _EnvSetting('PINECONE_API_KEY')
+    PINECONE_ENVIRONMENT = _EnvSetting('PINECONE_ENVIRONMENT', 'us-east-1')
+    PINECONE_INDEX_NAME = _EnvSetting('PINECONE_INDEX_NAME', 'mental-health-embeddings')
     
     # Email Configuration
-    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
-    MAIL_PORT = int(os.environ.get('MAIL_PORT', '587'))
-    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() in ['true', 'on', '1']
-    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
-    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_SERVER = _EnvSetting('MAIL_SERVER', 'smtp.gmail.com')
+    MAIL_PORT = _EnvSetting('MAIL_PORT', '587', cast=int)
+    MAIL_USE_TLS = _EnvSetting('MAIL_USE_TLS', 'true', cast=_as_bool)
+    MAIL_USERNAME = _EnvSetting('MAIL_USERNAME')
+    MAIL_PASSWORD = _EnvSetting('MAIL_PASSWORD')
     
     # Application Configuration
-    APP_NAME = os.environ.get('APP_NAME', 'Mental Health ChatBot')
-    APP_VERSION = os.environ.get('APP_VERSION', '1.0.0')
-    DEBUG = os.environ.get('FLASK_ENV') == 'development'
+    APP_NAME = _EnvSetting('APP_NAME', 'Mental Health ChatBot')
+    APP_VERSION = _EnvSetting('APP_VERSION', '1.0.0')
+    # Re-read on access so tests can flip FLASK_ENV without re-importing
+    DEBUG = _EnvSetting('FLASK_ENV', '', cast=lambda value: value == 'development')
     
     # Security Configuration
-    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', '12'))
+    BCRYPT_LOG_ROUNDS = _EnvSetting('BCRYPT_LOG_ROUNDS', '12', cast=int)
     
     # File Upload Configuration
-    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', '16777216'))  # 16MB
-    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')
+    MAX_CONTENT_LENGTH = _EnvSetting('MAX_CONTENT_LENGTH', '16777216', cast=int)  # 16MB
+    UPLOAD_FOLDER = _EnvSetting('UPLOAD_FOLDER', 'uploads')
     
     # Pagination
     POSTS_PER_PAGE = 20
     
     # Rate Limiting
-    RATELIMIT_STORAGE_URL = os.environ.get('REDIS_URL', 'memory://')
+    RATELIMIT_STORAGE_URL = _EnvSetting('REDIS_URL', 'memory://')
     
     # CORS Configuration
-    CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
+    CORS_ORIGINS = _EnvSetting('CORS_ORIGINS', '*', cast=lambda value: value.split(','))
     
-    # Session Configuration
+    # Session Configuration (server-side in Redis when available, signed cookies otherwise)
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
+    REDIS_URL = _EnvSetting('REDIS_URL')
+    SESSION_TYPE = _EnvSetting('REDIS_URL', cast=lambda url: 'redis' if url else None)
+    SESSION_KEY_PREFIX = 'session:'
     
     # Logging Configuration
-    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
-    LOG_FILE = os.environ.get('LOG_FILE', 'app.log')
+    LOG_LEVEL = _EnvSetting('LOG_LEVEL', 'INFO')
+    LOG_FILE = _EnvSetting('LOG_FILE', 'app.log')
+    
+    # Query Audit Configuration
+    SQL_AUDIT_ENABLED = _EnvSetting('SQL_AUDIT_ENABLED', 'true', cast=_as_bool)
+    SLOW_QUERY_MS = _EnvSetting('SLOW_QUERY_MS', '100', cast=int)
+    QUERY_COUNT_WARNING = _EnvSetting('QUERY_COUNT_WARNING', '10', cast=int)
+    # Tighter per-endpoint query limits for hot paths
+    QUERY_BUDGETS = {
+        'api.get_mood_entries': 3,
+        'auth.verify_token': 2
+    }
+    QUERY_BUDGET_STRICT = False
+    
+    # NLP Configuration
+    # Load the NLP models in a background thread when each worker starts
+    NLP_WARMUP = _EnvSetting('NLP_WARMUP', 'true', cast=_as_bool)
     
     # Cache Configuration
-    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'simple')
-    CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', '300'))
+    CACHE_TYPE = _EnvSetting('CACHE_TYPE', lambda: 'RedisCache' if os.environ.get('REDIS_URL') else 'SimpleCache')
+    CACHE_REDIS_URL = _EnvSetting('REDIS_URL')
+    CACHE_DEFAULT_TIMEOUT = _EnvSetting('CACHE_DEFAULT_TIMEOUT', '300', cast=int)
     
     # External APIs
-    HUGGINGFACE_API_KEY = os.environ.get('HUGGINGFACE_API_KEY')
+    HUGGINGFACE_API_KEY = _EnvSetting('HUGGINGFACE_API_KEY')
 
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE_URL') or 'sqlite:///mental_health_chatbot_dev.db'
+    SQLALCHEMY_DATABASE_URI = _EnvSetting('DEV_DATABASE_URL', 'sqlite:///mental_health_chatbot_dev.db', empty_is_unset=True)
 
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///mental_health_chatbot.db'
+    SQLALCHEMY_DATABASE_URI = _EnvSetting('DATABASE_URL', 'sqlite:///mental_health_chatbot.db', empty_is_unset=True)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        **Config.SQLALCHEMY_ENGINE_OPTIONS,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', '20')),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '40'))
+    }
 
 class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # In-memory SQLite uses a single static connection, which takes no pool sizing
+    SQLALCHEMY_ENGINE_OPTIONS = {}
     WTF_CSRF_ENABLED = False
+    CACHE_TYPE = 'NullCache'
+    SESSION_TYPE = None
+    # Fail the request under test when an endpoint goes over its query budget
+    QUERY_BUDGET_STRICT = True
+    NLP_WARMUP = False
 
 # Configuration mapping
 config = {
@@ -2,10 +2,20 @@
 Web Routes Package
 """
 
-from .auth import auth_bp
-from .chat import chat_bp
-from .dashboard import dashboard_bp
-from .admin import admin_bp
-from .api import api_bp
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ['auth_bp', 'chat_bp', 'dashboard_bp', 'admin_bp', 'api_bp']
\ No newline at end of file
+if TYPE_CHECKING:
+    from .auth import auth_bp
+    from .chat import chat_bp
+    from .dashboard import dashboard_bp
+    from .admin import admin_bp
+    from .api import api_bp
+
+__all__ = ['auth_bp', 'chat_bp', 'dashboard_bp', 'admin_bp', 'api_bp']
+
+def __getattr__(name):
+    """Import a blueprint's route module on first access"""
+    if name in __all__:
+        return getattr(importlib.import_module(f'.{name[:-3]}', __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
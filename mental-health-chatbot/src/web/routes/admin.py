@@ -2,58 +2,132 @@
 Admin Routes - Administrative functions
 """
 
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, Response, render_template, request, jsonify, flash, redirect, url_for, stream_with_context, g
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload, load_only, selectinload
 from src.db.models import User, ChatSession, Message, MoodEntry, Assessment, ContactMessage, db
+from src.web.app import cache
+from src.web.utils.helpers import send_email_async
 from datetime import datetime, timedelta
+from functools import wraps
+import csv
+import io
 import json
 
 admin_bp = Blueprint('admin', __name__)
 
+# Rows fetched per round trip when streaming CSV exports
+EXPORT_BATCH_SIZE = 1000
+
+# Rows per page on the admin list views
+LIST_PAGE_SIZE = 20
+
+# List totals already computed by the cached dashboard stats
+LIST_STAT_TOTALS = {User: 'total_users', ChatSession: 'total_sessions'}
+
+# CSV header and source column for each exportable table
+EXPORT_COLUMNS = {
+    'users': [
+        ('ID', User.id), ('Username', User.username), ('Email', User.email),
+        ('First Name', User.first_name), ('Last Name', User.last_name),
+        ('Created At', User.created_at), ('Last Login', User.last_login), ('Is Active', User.is_active)
+    ],
+    'sessions': [
+        ('ID', ChatSession.id), ('User ID', ChatSession.user_id), ('Session ID', ChatSession.session_id),
+        ('Is Anonymous', ChatSession.is_anonymous), ('Mood Detected', ChatSession.mood_detected),
+        ('Sentiment Score', ChatSession.sentiment_score), ('Created At', ChatSession.created_at),
+        ('Is Active', ChatSession.is_active)
+    ],
+    'mood_entries': [
+        ('ID', MoodEntry.id), ('User ID', MoodEntry.user_id), ('Mood Score', MoodEntry.mood_score),
+        ('Mood Label', MoodEntry.mood_label), ('Stress Level', MoodEntry.stress_level),
+        ('Energy Level', MoodEntry.energy_level), ('Sleep Hours', MoodEntry.sleep_hours),
+        ('Created At', MoodEntry.created_at)
+    ]
+}
+
+# Header row and streaming SELECT for each export, built once at import
+EXPORT_HEADERS = {name: [header for header, _ in columns] for name, columns in EXPORT_COLUMNS.items()}
+EXPORT_QUERIES = {
+    name: db.select(*[column for _, column in columns]).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    for name, columns in EXPORT_COLUMNS.items()
+}
+
+def _format_export_value(value):
+    """Render a column value for CSV export"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
 def admin_required(f):
     """Decorator to require admin access"""
-    from functools import wraps
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or not current_user.is_admin:
-            flash('Admin access required', 'error')
-            return redirect(url_for('auth.login'))
+        # Reuse the decision for the rest of the request
+        if not g.get('_admin_ok'):
+            if not current_user.is_authenticated or not current_user.is_admin:
+                flash('Admin access required', 'error')
+                return redirect(url_for('auth.login'))
+            g._admin_ok = True
         return f(*args, **kwargs)
     return decorated_function
 
+@cache.cached(timeout=30, key_prefix='admin_stats')
+def _compute_stats():
+    """Global dashboard counters, shared across admins for a short window"""
+    # Get basic statistics in one round trip: conditional sums per table, scalar counts for the rest
+    user_counts = db.select(
+        db.func.count(User.id).label('total_users'),
+        db.func.coalesce(db.func.sum(db.case((User.is_active == True, 1), else_=0)), 0).label('active_users')
+    ).subquery()
+    session_counts = db.select(
+        db.func.count(ChatSession.id).label('total_sessions'),
+        db.func.coalesce(db.func.sum(db.case((ChatSession.is_active == True, 1), else_=0)), 0).label('active_sessions'),
+        # Crisis detection stats
+        db.func.coalesce(db.func.sum(db.case((ChatSession.sentiment_score < -0.5, 1), else_=0)), 0).label('crisis_sessions')
+    ).subquery()
+    return dict(db.session.execute(db.select(
+        user_counts,
+        session_counts,
+        db.select(db.func.count(Message.id)).scalar_subquery().label('total_messages'),
+        db.select(db.func.count(MoodEntry.id)).scalar_subquery().label('total_mood_entries'),
+        db.select(db.func.count(Assessment.id)).scalar_subquery().label('total_assessments')
+    ).select_from(user_counts.join(session_counts, db.true()))).one()._mapping)
+
+@cache.memoize(timeout=30)
+def _count_rows(model):
+    """Row count for a table, cached briefly for pagination"""
+    return db.session.execute(db.select(db.func.count()).select_from(model)).scalar()
+
+def _paginate(query, model):
+    """Paginate a list query with a cached total instead of a COUNT per page"""
+    page = request.args.get('page', 1, type=int)
+    pagination = query.paginate(page=page, per_page=LIST_PAGE_SIZE, error_out=False, count=False)
+    stat = LIST_STAT_TOTALS.get(model)
+    pagination.total = _compute_stats()[stat] if stat else _count_rows(model)
+    return pagination
+
 @admin_bp.route('/')
 @admin_required
 def index():
     """Admin dashboard"""
-    # Get basic statistics
-    total_users = User.query.count()
-    active_users = User.query.filter_by(is_active=True).count()
-    total_sessions = ChatSession.query.count()
-    active_sessions = ChatSession.query.filter_by(is_active=True).count()
-    total_messages = Message.query.count()
-    total_mood_entries = MoodEntry.query.count()
-    total_assessments = Assessment.query.count()
-    
-    # Recent activity
-    recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
-    recent_sessions = ChatSession.query.order_by(ChatSession.created_at.desc()).limit(5).all()
-    recent_contacts = ContactMessage.query.order_by(ContactMessage.created_at.desc()).limit(5).all()
-    
-    # Crisis detection stats
-    crisis_sessions = ChatSession.query.filter(
-        ChatSession.sentiment_score < -0.5
-    ).count()
-    
-    stats = {
-        'total_users': total_users,
-        'active_users': active_users,
-        'total_sessions': total_sessions,
-        'active_sessions': active_sessions,
-        'total_messages': total_messages,
-        'total_mood_entries': total_mood_entries,
-        'total_assessments': total_assessments,
-        'crisis_sessions': crisis_sessions
-    }
+    stats = _compute_stats()
+    
+    # Recent activity (newest-first LIMIT reads walk the created_at indexes)
+    recent_users = User.query.options(
+        load_only(User.id, User.username, User.email, User.created_at)
+    ).order_by(User.created_at.desc()).limit(5).all()
+    recent_sessions = ChatSession.query.options(
+        load_only(ChatSession.id, ChatSession.user_id, ChatSession.session_id, ChatSession.is_anonymous,
+                  ChatSession.mood_detected, ChatSession.created_at),
+        selectinload(ChatSession.user).load_only(User.id, User.username)
+    ).order_by(ChatSession.created_at.desc()).limit(5).all()
+    recent_contacts = ContactMessage.query.options(
+        load_only(ContactMessage.id, ContactMessage.name, ContactMessage.email, ContactMessage.subject,
+                  ContactMessage.is_read, ContactMessage.created_at)
+    ).order_by(ContactMessage.created_at.desc()).limit(5).all()
     
     return render_template('admin/dashboard.html', 
                          stats=stats,
@@ -65,12 +139,11 @@ def index():
 @admin_required
 def users():
     """User management page"""
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    
-    users = User.query.paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    # List pages only need the summary columns, not the full profile
+    users = _paginate(User.query.options(
+        load_only(User.id, User.username, User.email, User.first_name, User.last_name,
+                  User.is_active, User.is_admin, User.created_at, User.last_login)
+    ).order_by(User.id), User)
     
     return render_template('admin/users.html', users=users)
 
@@ -81,7 +154,9 @@ def user_detail(user_id):
     user = User.query.get_or_404(user_id)
     
     # Get user's recent activity
-    recent_sessions = ChatSession.query.filter_by(user_id=user_id).order_by(ChatSession.created_at.desc()).limit(10).all()
+    recent_sessions = ChatSession.query.options(
+        selectinload(ChatSession.messages)
+    ).filter_by(user_id=user_id).order_by(ChatSession.created_at.desc()).limit(10).all()
     recent_mood_entries = MoodEntry.query.filter_by(user_id=user_id).order_by(MoodEntry.created_at.desc()).limit(10).all()
     recent_assessments = Assessment.query.filter_by(user_id=user_id).order_by(Assessment.created_at.desc()).limit(5).all()
     
@@ -112,12 +187,14 @@ def toggle_user_active(user_id):
 @admin_required
 def sessions():
     """Chat sessions management"""
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    
-    sessions = ChatSession.query.order_by(ChatSession.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    sessions = _paginate(ChatSession.query.options(
+        load_only(ChatSession.id, ChatSession.user_id, ChatSession.session_id, ChatSession.is_anonymous,
+                  ChatSession.mood_detected, ChatSession.sentiment_score, ChatSession.created_at,
+                  ChatSession.is_active),
+        selectinload(ChatSession.user).load_only(User.id, User.username, User.email),
+        # Message bodies are only shown on the detail page
+        selectinload(ChatSession.messages).load_only(Message.id, Message.sender, Message.created_at)
+    ).order_by(ChatSession.created_at.desc()), ChatSession)
     
     return render_template('admin/sessions.html', sessions=sessions)
 
@@ -125,13 +202,22 @@ def sessions():
 @admin_required
 def session_detail(session_id):
     """Session detail page"""
-    session = ChatSession.query.get_or_404(session_id)
+    # Messages resolve their chat_session from the identity map once the session is loaded
+    session = ChatSession.query.options(joinedload(ChatSession.user)).filter_by(id=session_id).first_or_404()
     messages = Message.query.filter_by(session_id=session.id).order_by(Message.created_at).all()
     
     return render_template('admin/session_detail.html', 
                          session=session,
                          messages=messages)
 
+def _grouped_counts(model, key, start_date):
+    """Rows created since start_date counted per key, as plain Core rows"""
+    return db.session.execute(
+        db.select(key, db.func.count(model.id).label('count'))
+        .where(model.created_at >= start_date)
+        .group_by(key)
+    ).all()
+
 @admin_bp.route('/analytics')
 @admin_required
 def analytics():
@@ -141,40 +227,16 @@ def analytics():
     start_date = datetime.now() - timedelta(days=days)
     
     # User registration trends
-    user_registrations = db.session.query(
-        db.func.date(User.created_at).label('date'),
-        db.func.count(User.id).label('count')
-    ).filter(
-        User.created_at >= start_date
-    ).group_by(
-        db.func.date(User.created_at)
-    ).all()
+    user_registrations = _grouped_counts(User, db.func.date(User.created_at).label('date'), start_date)
     
     # Session trends
-    session_trends = db.session.query(
-        db.func.date(ChatSession.created_at).label('date'),
-        db.func.count(ChatSession.id).label('count')
-    ).filter(
-        ChatSession.created_at >= start_date
-    ).group_by(
-        db.func.date(ChatSession.created_at)
-    ).all()
+    session_trends = _grouped_counts(ChatSession, db.func.date(ChatSession.created_at).label('date'), start_date)
     
     # Mood distribution
-    mood_distribution = db.session.query(
-        MoodEntry.mood_score,
-        db.func.count(MoodEntry.id).label('count')
-    ).filter(
-        MoodEntry.created_at >= start_date
-    ).group_by(MoodEntry.mood_score).all()
+    mood_distribution = _grouped_counts(MoodEntry, MoodEntry.mood_score, start_date)
     
     # Assessment results
-    assessment_results = db.session.query(
-        Assessment.severity_level,
-        db.func.count(Assessment.id).label('count')
-    ).filter(
-        Assessment.created_at >= start_date
-    ).group_by(Assessment.severity_level).all()
+    assessment_results = _grouped_counts(Assessment, Assessment.severity_level, start_date)
     
     return render_template('admin/analytics.html',
                          user_registrations=user_registrations,
@@ -187,12 +249,10 @@ def analytics():
 @admin_required
 def contact_messages():
     """Contact form messages"""
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    
-    messages = ContactMessage.query.order_by(ContactMessage.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    messages = _paginate(ContactMessage.query.options(
+        load_only(ContactMessage.id, ContactMessage.name, ContactMessage.email, ContactMessage.subject,
+                  ContactMessage.is_read, ContactMessage.created_at, ContactMessage.replied_at)
+    ).order_by(ContactMessage.created_at.desc()), ContactMessage)
     
     return render_template('admin/contact_messages.html', messages=messages)
 
@@ -223,12 +283,12 @@ def reply_to_contact(message_id):
         
         db.session.commit()
         
-        # Send email reply (would need email service)
-        # send_email(
-        #     to=message.email,
-        #     subject=f'Re: {message.subject}',
-        #     body=reply_text
-        # )
+        # Send email reply in the background once the reply is saved
+        send_email_async(
+            to=message.email,
+            subject=f'Re: {message.subject}',
+            body=reply_text
+        )
         
         return jsonify({'message': 'Reply sent successfully'})
         
@@ -243,63 +303,25 @@ def export_data():
     format_type = request.args.get('format', 'csv')
     data_type = request.args.get('type', 'users')
     
-    if format_type == 'csv':
-        import csv
-        import io
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        if data_type == 'users':
-            writer.writerow(['ID', 'Username', 'Email', 'First Name', 'Last Name', 'Created At', 'Last Login', 'Is Active'])
-            users = User.query.all()
-            for user in users:
-                writer.writerow([
-                    user.id,
-                    user.username,
-                    user.email,
-                    user.first_name or '',
-                    user.last_name or '',
-                    user.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else '',
-                    user.is_active
-                ])
-        
-        elif data_type == 'sessions':
-            writer.writerow(['ID', 'User ID', 'Session ID', 'Is Anonymous', 'Mood Detected', 'Sentiment Score', 'Created At', 'Is Active'])
-            sessions = ChatSession.query.all()
-            for session in sessions:
-                writer.writerow([
-                    session.id,
-                    session.user_id or '',
-                    session.session_id,
-                    session.is_anonymous,
-                    session.mood_detected or '',
-                    session.sentiment_score or '',
-                    session.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    session.is_active
-                ])
-        
-        elif data_type == 'mood_entries':
-            writer.writerow(['ID', 'User ID', 'Mood Score', 'Mood Label', 'Stress Level', 'Energy Level', 'Sleep Hours', 'Created At'])
-            entries = MoodEntry.query.all()
-            for entry in entries:
-                writer.writerow([
-                    entry.id,
-                    entry.user_id,
-                    entry.mood_score,
-                    entry.mood_label,
-                    entry.stress_level or '',
-                    entry.energy_level or '',
-                    entry.sleep_hours or '',
-                    entry.created_at.strftime('%Y-%m-%d %H:%M:%S')
-                ])
-        
-        output.seek(0)
+    if format_type == 'csv' and data_type in EXPORT_COLUMNS:
+        def generate():
+            # One buffer per export, drained after every batch
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_HEADERS[data_type])
+            
+            # Stream plain rows in chunks instead of hydrating every ORM object
+            result = db.session.execute(EXPORT_QUERIES[data_type])
+            for partition in result.partitions():
+                writer.writerows([_format_export_value(value) for value in row] for row in partition)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            
+            yield buffer.getvalue()
         
-        from flask import Response
         return Response(
-            output.getvalue(),
+            stream_with_context(generate()),
             mimetype='text/csv',
             headers={'Content-Disposition': f'attachment; filename={data_type}_{datetime.now().strftime("%Y%m%d")}.csv'}
         )
@@ -319,7 +341,9 @@ def system_health():
     
     # Check database
     try:
-        db.session.execute('SELECT 1')
+        # Probe on a pooled connection directly, bypassing the ORM session
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('SELECT 1')
         health_status['database'] = 'healthy'
     except Exception as e:
         health_status['database'] = f'error: {str(e)}'
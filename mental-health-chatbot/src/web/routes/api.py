@@ -2,15 +2,23 @@
 API Routes - REST API endpoints
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
 from src.db.models import User, ChatSession, Message, MoodEntry, Assessment, Recommendation, db
 from src.nlp.gpt_handler import GPTHandler
 from src.nlp.sentiment_analysis import SentimentAnalyzer
 from src.nlp.intent_detection import IntentDetector
 from src.ml.models.recommendation_engine import RecommendationEngine
+from src.web.app import load_cached_user
+from src.web.utils.nlp_cache import analyze_message, cached_nlp
+from src.web.utils.login_tracker import record_login
+from src.web.utils.helpers import generate_session_id
+from src.web.utils.validators import mood_fields_error
+from src.web.utils.recommendation_queue import enqueue_recommendations, get_recommendation_result, recommendation_inputs
 from datetime import datetime, timedelta
-import json
+import orjson
 
 api_bp = Blueprint('api', __name__)
 
@@ -20,6 +28,14 @@ sentiment_analyzer = SentimentAnalyzer()
 intent_detector = IntentDetector()
 recommendation_engine = RecommendationEngine()
 
+# Unique constraint names as reported by PostgreSQL and SQLite
+USERNAME_CONSTRAINTS = ('users_username_key', 'users.username')
+EMAIL_CONSTRAINTS = ('users_email_key', 'users.email')
+
+# Single-text endpoints share cached results with the chat flow
+cached_sentiment = cached_nlp('sent')(sentiment_analyzer.analyze_sentiment)
+cached_intent = cached_nlp('intent')(intent_detector.detect_intent)
+
 @api_bp.route('/health')
 def health_check():
     """API health check"""
@@ -44,15 +60,18 @@ def api_login():
         (User.username == username) | (User.email == username)
     ).first()
     
+    # Unknown usernames still pay for a hash verify so response time does not reveal them
+    if user is None:
+        User.check_dummy_password(password)
+    
     if user and user.check_password(password) and user.is_active:
         from flask_jwt_extended import create_access_token, create_refresh_token
         
         access_token = create_access_token(identity=user.id)
         refresh_token = create_refresh_token(identity=user.id)
         
-        # Update last login
-        user.last_login = datetime.utcnow()
-        db.session.commit()
+        # Update last login (written in the next batched flush)
+        record_login(user)
         
         return jsonify({
             'access_token': access_token,
@@ -77,12 +96,7 @@ def api_register():
     if not username or not email or not password:
         return jsonify({'error': 'Username, email, and password are required'}), 400
     
-    if User.query.filter_by(username=username).first():
-        return jsonify({'error': 'Username already exists'}), 400
-    
-    if User.query.filter_by(email=email).first():
-        return jsonify({'error': 'Email already registered'}), 400
-    
+    # Duplicates are caught by the unique constraints on insert
     try:
         user = User(
             username=username,
@@ -107,6 +121,16 @@ def api_register():
             'user': user.to_dict()
         }), 201
         
+    except IntegrityError as e:
+        db.session.rollback()
+        # Only the first line names the constraint; later lines echo the values
+        violation = str(e.orig).splitlines()[0]
+        if any(name in violation for name in USERNAME_CONSTRAINTS):
+            return jsonify({'error': 'Username already exists'}), 400
+        if any(name in violation for name in EMAIL_CONSTRAINTS):
+            return jsonify({'error': 'Email already registered'}), 400
+        return jsonify({'error': 'Registration failed'}), 500
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Registration failed'}), 500
@@ -119,8 +143,7 @@ def create_chat_session():
     user_id = get_jwt_identity()
     is_anonymous = data.get('anonymous', False)
     
-    import uuid
-    session_id = str(uuid.uuid4())
+    session_id = generate_session_id()
     
     chat_session = ChatSession(
         session_id=session_id,
@@ -146,8 +169,10 @@ def send_chat_message(session_id):
     if not message_text:
         return jsonify({'error': 'Message cannot be empty'}), 400
     
-    # Get chat session
-    chat_session = ChatSession.query.filter_by(session_id=session_id).first()
+    # Get chat session (only the columns the permission check reads)
+    chat_session = ChatSession.query.options(
+        load_only(ChatSession.id, ChatSession.user_id, ChatSession.is_anonymous)
+    ).filter_by(session_id=session_id).first()
     if not chat_session:
         return jsonify({'error': 'Session not found'}), 404
     
@@ -164,11 +189,16 @@ def send_chat_message(session_id):
             content=message_text,
             message_type='text'
         )
-        db.session.add(user_message)
         
         # Analyze message
-        sentiment_result = sentiment_analyzer.analyze_sentiment(message_text)
-        intent_result = intent_detector.detect_intent(message_text)
+        sentiment_result, intent_result = analyze_message(message_text, sentiment_analyzer, intent_detector)
+        
+        # Queue recommendations for clients that poll for them after the reply
+        recommendations_task_id = recommendations_url = None
+        inputs = recommendation_inputs(sentiment_result, intent_result)
+        if inputs and data.get('async_recommendations'):
+            recommendations_task_id = enqueue_recommendations(recommendation_engine, *inputs, user_id)
+            recommendations_url = url_for('api.get_queued_recommendations', task_id=recommendations_task_id)
         
         # Generate GPT response
         gpt_response = gpt_handler.generate_response(
@@ -184,30 +214,44 @@ def send_chat_message(session_id):
             sender='bot',
             content=bot_response_text,
             message_type='text',
-            metadata=json.dumps({
+            message_metadata={
                 'sentiment': sentiment_result,
                 'intent': intent_result,
                 'gpt_metadata': gpt_response
-            })
+            }
         )
-        db.session.add(bot_message)
         
         # Update chat session
         chat_session.mood_detected = sentiment_result.get('sentiment_label')
         chat_session.sentiment_score = sentiment_result.get('polarity')
         
+        # Both rows go out in one executemany at commit
+        db.session.add_all([user_message, bot_message])
         db.session.commit()
         
         return jsonify({
             'message': bot_response_text,
             'sentiment': sentiment_result,
-            'intent': intent_result
+            'intent': intent_result,
+            'recommendations_task_id': recommendations_task_id,
+            'recommendations_url': recommendations_url
         })
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to process message'}), 500
 
+@api_bp.route('/chat/recommendations/<task_id>')
+@jwt_required()
+def get_queued_recommendations(task_id):
+    """Poll for recommendations queued by one of the user's chat messages"""
+    result = get_recommendation_result(task_id, get_jwt_identity())
+    if result is None:
+        return jsonify({'error': 'Recommendations not found'}), 404
+    if result['status'] == 'pending':
+        return jsonify(result), 202
+    return jsonify(result)
+
 @api_bp.route('/mood/entry', methods=['POST'])
 @jwt_required()
 def add_mood_entry():
@@ -215,6 +259,10 @@ def add_mood_entry():
     data = request.get_json()
     user_id = get_jwt_identity()
     
+    error = mood_fields_error([data])
+    if error:
+        return jsonify({'error': error}), 400
+    
     try:
         mood_entry = MoodEntry(
             user_id=user_id,
@@ -249,24 +297,22 @@ def get_mood_entries():
     days = request.args.get('days', 30, type=int)
     start_date = datetime.now() - timedelta(days=days)
     
-    entries = MoodEntry.query.filter(
-        MoodEntry.user_id == user_id,
-        MoodEntry.created_at >= start_date
-    ).order_by(MoodEntry.created_at.desc()).all()
-    
-    entries_data = []
-    for entry in entries:
-        entries_data.append({
-            'id': entry.id,
-            'mood_score': entry.mood_score,
-            'mood_label': entry.mood_label,
-            'activities': entry.get_activities(),
-            'notes': entry.notes,
-            'energy_level': entry.energy_level,
-            'sleep_hours': entry.sleep_hours,
-            'stress_level': entry.stress_level,
-            'created_at': entry.created_at.isoformat()
-        })
+    entries = db.session.execute(
+        db.select(
+            MoodEntry.id, MoodEntry.mood_score, MoodEntry.mood_label, MoodEntry.activities,
+            MoodEntry.notes, MoodEntry.energy_level, MoodEntry.sleep_hours, MoodEntry.stress_level,
+            MoodEntry.created_at
+        ).where(
+            MoodEntry.user_id == user_id,
+            MoodEntry.created_at >= start_date
+        ).order_by(MoodEntry.created_at.desc())
+    ).mappings().all()
+    
+    # Activities are stored as JSON text, so they are embedded without re-parsing
+    entries_data = [
+        {**entry, 'activities': orjson.Fragment(entry['activities'] or '[]')}
+        for entry in entries
+    ]
     
     return jsonify({
         'entries': entries_data,
@@ -326,7 +372,12 @@ def get_recommendations():
     assessment_results = data.get('assessment_results')
     
     # Get user's recent mood data
-    recent_mood = MoodEntry.query.filter_by(user_id=user_id).order_by(MoodEntry.created_at.desc()).first()
+    recent_mood = db.session.execute(
+        db.select(MoodEntry.mood_score, MoodEntry.stress_level)
+        .where(MoodEntry.user_id == user_id)
+        .order_by(MoodEntry.created_at.desc())
+        .limit(1)
+    ).first()
     if recent_mood:
         user_profile.setdefault('mood_score', recent_mood.mood_score)
         user_profile.setdefault('stress_level', recent_mood.stress_level or 5)
@@ -351,7 +402,7 @@ def analyze_sentiment():
         return jsonify({'error': 'Text is required'}), 400
     
     try:
-        result = sentiment_analyzer.analyze_sentiment(text)
+        result = cached_sentiment(text)
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': 'Failed to analyze sentiment'}), 500
@@ -366,7 +417,7 @@ def detect_intent():
         return jsonify({'error': 'Text is required'}), 400
     
     try:
-        result = intent_detector.detect_intent(text)
+        result = cached_intent(text)
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': 'Failed to detect intent'}), 500
@@ -401,6 +452,34 @@ def submit_contact():
         db.session.rollback()
         return jsonify({'error': 'Failed to submit contact message'}), 500
 
+def _mood_export_row(row):
+    """Embed the stored activities JSON without re-parsing it"""
+    return {**row, 'activities': orjson.Fragment(row['activities'] or '[]')}
+
+def _assessment_export_row(row):
+    """Embed the stored responses JSON without re-parsing it"""
+    return {**row, 'responses': orjson.Fragment(row['responses'] or '{}')}
+
+# Rows fetched per round trip when streaming NDJSON exports
+EXPORT_BATCH_SIZE = 500
+
+# Section name, NDJSON record type, table, exported columns and row formatter for each export part
+USER_EXPORT_SECTIONS = [
+    ('mood_entries', 'mood_entry', MoodEntry, [
+        MoodEntry.mood_score, MoodEntry.mood_label, MoodEntry.activities, MoodEntry.notes,
+        MoodEntry.energy_level, MoodEntry.sleep_hours, MoodEntry.stress_level, MoodEntry.created_at
+    ], _mood_export_row),
+    ('assessments', 'assessment', Assessment, [
+        Assessment.assessment_type.label('type'), Assessment.total_score, Assessment.severity_level,
+        Assessment.responses, Assessment.created_at
+    ], _assessment_export_row),
+    ('recommendations', 'recommendation', Recommendation, [
+        Recommendation.recommendation_type.label('type'), Recommendation.title,
+        Recommendation.description, Recommendation.priority, Recommendation.is_completed,
+        Recommendation.created_at
+    ], dict)
+]
+
 @api_bp.route('/export/data')
 @jwt_required()
 def export_user_data():
@@ -410,49 +489,30 @@ def export_user_data():
     
     if format_type == 'json':
         # Get user data
-        user = User.query.get(user_id)
-        mood_entries = MoodEntry.query.filter_by(user_id=user_id).all()
-        assessments = Assessment.query.filter_by(user_id=user_id).all()
-        recommendations = Recommendation.query.filter_by(user_id=user_id).all()
-        
-        export_data = {
-            'user': user.to_dict(),
-            'mood_entries': [],
-            'assessments': [],
-            'recommendations': []
-        }
-        
-        for entry in mood_entries:
-            export_data['mood_entries'].append({
-                'mood_score': entry.mood_score,
-                'mood_label': entry.mood_label,
-                'activities': entry.get_activities(),
-                'notes': entry.notes,
-                'energy_level': entry.energy_level,
-                'sleep_hours': entry.sleep_hours,
-                'stress_level': entry.stress_level,
-                'created_at': entry.created_at.isoformat()
-            })
-        
-        for assessment in assessments:
-            export_data['assessments'].append({
-                'type': assessment.assessment_type,
-                'total_score': assessment.total_score,
-                'severity_level': assessment.severity_level,
-                'responses': assessment.get_responses(),
-                'created_at': assessment.created_at.isoformat()
-            })
-        
-        for rec in recommendations:
-            export_data['recommendations'].append({
-                'type': rec.recommendation_type,
-                'title': rec.title,
-                'description': rec.description,
-                'priority': rec.priority,
-                'is_completed': rec.is_completed,
-                'created_at': rec.created_at.isoformat()
-            })
+        user = load_cached_user(user_id)
+        export_data = {'user': user.to_dict()}
+        for section, _, model, columns, format_row in USER_EXPORT_SECTIONS:
+            rows = db.session.execute(db.select(*columns).where(model.user_id == user_id)).mappings()
+            export_data[section] = [format_row(row) for row in rows]
         
         return jsonify(export_data)
     
+    if format_type == 'ndjson':
+        user = load_cached_user(user_id)
+        
+        def generate():
+            yield orjson.dumps({'type': 'user', **user.to_dict()}) + b'\n'
+            # Server-side cursor batches keep memory flat however many rows a user has
+            for _, record_type, model, columns, format_row in USER_EXPORT_SECTIONS:
+                result = db.session.execute(
+                    db.select(*columns).where(model.user_id == user_id)
+                    .execution_options(yield_per=EXPORT_BATCH_SIZE)
+                ).mappings()
+                for partition in result.partitions():
+                    yield b''.join(
+                        orjson.dumps({'type': record_type, **format_row(row)}) + b'\n' for row in partition
+                    )
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
     return jsonify({'error': 'Invalid format'}), 400
\ No newline at end of file
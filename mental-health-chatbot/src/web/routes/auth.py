@@ -9,12 +9,26 @@ from werkzeug.security import check_password_hash
 from src.db.models import User, db
 from src.web.utils.validators import validate_email, validate_password, validate_username
 from src.web.utils.auth_utils import generate_confirmation_token, confirm_token
-from src.web.utils.helpers import send_email
+from src.web.utils.helpers import send_email_async
+from src.web.app import cache, load_cached_user
+from src.web.utils.login_tracker import record_login
 from datetime import datetime, timedelta
+import hashlib
 import uuid
 
 auth_bp = Blueprint('auth', __name__)
 
+# Password reset requests allowed per email address within the window
+PASSWORD_RESET_LIMIT = 3
+PASSWORD_RESET_WINDOW = 3600
+
+def _password_reset_allowed(email):
+    """Count a reset request for this email and report whether it is under the limit"""
+    key = f'fp:{hashlib.blake2b(email.encode(), digest_size=16).hexdigest()}'
+    cache.add(key, 0, timeout=PASSWORD_RESET_WINDOW)
+    attempts = cache.cache.inc(key)
+    return attempts is None or attempts <= PASSWORD_RESET_LIMIT
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """User login"""
@@ -39,6 +53,10 @@ def login():
             (User.username == username) | (User.email == username)
         ).first()
         
+        # Unknown usernames still pay for a hash verify so response time does not reveal them
+        if user is None:
+            User.check_dummy_password(password)
+        
         if user and user.check_password(password):
             if not user.is_active:
                 error_msg = 'Account is deactivated. Please contact support.'
@@ -47,9 +65,8 @@ def login():
                 flash(error_msg, 'error')
                 return render_template('login.html')
             
-            # Update last login
-            user.last_login = datetime.utcnow()
-            db.session.commit()
+            # Update last login (written in the next batched flush)
+            record_login(user)
             
             # Login user
             login_user(user, remember=remember)
@@ -95,19 +112,20 @@ def register():
         
         # Validation
         errors = []
+        username_taken, email_taken = User.find_taken(username, email)
         
         if not username:
             errors.append('Username is required')
         elif not validate_username(username):
             errors.append('Username must be 3-20 characters and contain only letters, numbers, and underscores')
-        elif User.query.filter_by(username=username).first():
+        elif username_taken:
             errors.append('Username already exists')
         
         if not email:
             errors.append('Email is required')
         elif not validate_email(email):
             errors.append('Invalid email format')
-        elif User.query.filter_by(email=email).first():
+        elif email_taken:
             errors.append('Email already registered')
         
         if not password:
@@ -140,11 +158,10 @@ def register():
             
             # Send welcome email (optional)
             try:
-                send_email(
+                send_email_async(
                     to=user.email,
                     subject='Welcome to Mental Health ChatBot',
-                    template='emails/welcome.html',
-                    user=user
+                    html=render_template('emails/welcome.html', user=user)
                 )
             except Exception as e:
                 print(f"Error sending welcome email: {e}")
@@ -198,7 +215,7 @@ def update_profile():
         if 'email' in data:
             email = data['email'].strip().lower()
             if validate_email(email) and email != current_user.email:
-                if User.query.filter_by(email=email).first():
+                if db.session.execute(db.select(db.exists().where(User.email == email))).scalar():
                     return jsonify({'error': 'Email already exists'}), 400
                 current_user.email = email
         
@@ -268,20 +285,19 @@ def forgot_password():
             flash(error_msg, 'error')
             return render_template('forgot_password.html')
         
-        user = User.query.filter_by(email=email).first()
+        # Over the limit skips the lookup entirely but still answers with the generic message
+        user = User.query.filter_by(email=email).first() if _password_reset_allowed(email) else None
         if user:
             # Generate reset token
             token = generate_confirmation_token(user.email)
             
-            # Send reset email
+            # Queue reset email
             try:
                 reset_url = url_for('auth.reset_password', token=token, _external=True)
-                send_email(
+                send_email_async(
                     to=user.email,
                     subject='Password Reset Request',
-                    template='emails/reset_password.html',
-                    user=user,
-                    reset_url=reset_url
+                    html=render_template('emails/reset_password.html', user=user, reset_url=reset_url)
                 )
             except Exception as e:
                 print(f"Error sending reset email: {e}")
@@ -357,7 +373,7 @@ def reset_password(token):
 def refresh():
     """Refresh JWT token"""
     current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = load_cached_user(current_user_id)
     
     if not user or not user.is_active:
         return jsonify({'error': 'User not found or inactive'}), 401
@@ -373,7 +389,7 @@ def refresh():
 def verify_token():
     """Verify JWT token"""
     current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = load_cached_user(current_user_id)
     
     if not user or not user.is_active:
         return jsonify({'error': 'Invalid token'}), 401
@@ -2,7 +2,7 @@
 Chat Routes - Handles chatbot interactions
 """
 
-from flask import Blueprint, render_template, request, jsonify, session
+from flask import Blueprint, Response, g, render_template, request, jsonify, session, stream_with_context, url_for
 from flask_login import login_required, current_user
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.db.models import ChatSession, Message, db
@@ -11,20 +11,55 @@ from src.nlp.sentiment_analysis import SentimentAnalyzer
 from src.nlp.intent_detection import IntentDetector
 from src.nlp.conversation_context import ConversationContext
 from src.ml.models.recommendation_engine import RecommendationEngine
+from src.web.utils.nlp_cache import analyze_message
+from src.web.utils.helpers import generate_session_id
+from src.web.utils.recommendation_queue import (
+    RECOMMENDATION_LIMIT, enqueue_recommendations, get_recommendation_result, recommendation_inputs
+)
+from src.web.utils.context_store import context_store, serialize_context, deserialize_context
 from datetime import datetime
-import uuid
-import json
+import csv
+import io
+import orjson
 
 chat_bp = Blueprint('chat', __name__)
 
+# Messages fetched per round trip when streaming a chat export
+EXPORT_BATCH_SIZE = 500
+
 # Initialize NLP components
 gpt_handler = GPTHandler()
 sentiment_analyzer = SentimentAnalyzer()
 intent_detector = IntentDetector()
 recommendation_engine = RecommendationEngine()
 
-# Store conversation contexts in memory (in production, use Redis)
-conversation_contexts = {}
+def get_chat_session(session_id):
+    """Chat session for an id, looked up at most once per request"""
+    sessions = g.setdefault('chat_sessions', {})
+    if session_id not in sessions:
+        sessions[session_id] = ChatSession.query.filter_by(session_id=session_id).first()
+    return sessions[session_id]
+
+def load_context(session_id, chat_session=None):
+    """Stored context for a session, rebuilt from its saved context_data once evicted"""
+    context = context_store.get(session_id)
+    if context is not None:
+        return context
+    
+    if chat_session is None:
+        row = db.session.execute(
+            db.select(ChatSession.context_data, ChatSession.is_active)
+            .where(ChatSession.session_id == session_id)
+        ).first()
+    else:
+        row = chat_session
+    
+    # Ended sessions stay ended even though their last context is still saved
+    if row is None or not row.is_active or not row.context_data:
+        return None
+    context = deserialize_context(row.context_data)
+    context_store.set(session_id, context)
+    return context
 
 @chat_bp.route('/')
 @login_required
@@ -44,7 +79,7 @@ def start_session():
     is_anonymous = data.get('anonymous', False)
     
     # Generate session ID
-    session_id = str(uuid.uuid4())
+    session_id = generate_session_id()
     
     # Create chat session
     chat_session = ChatSession(
@@ -62,138 +97,157 @@ def start_session():
         session_id=session_id,
         user_id=current_user.id if current_user.is_authenticated and not is_anonymous else None
     )
-    conversation_contexts[session_id] = context
+    context_store.set(session_id, context)
     
     return jsonify({
         'session_id': session_id,
         'message': 'Chat session started'
     })
 
-@chat_bp.route('/api/session/<session_id>/message', methods=['POST'])
-def send_message(session_id):
-    """Send a message to the chatbot"""
+def _prepare_turn(chat_session, context, message_text):
+    """Analyze a user message and build the GPT request for the reply"""
+    # User message, saved together with the bot response
+    user_message = Message(
+        session_id=chat_session.id,
+        sender='user',
+        content=message_text,
+        message_type='text'
+    )
+    
+    # Add to conversation context
+    context.add_message('user', message_text)
+    
+    # Analyze message
+    sentiment_result, intent_result = analyze_message(message_text, sentiment_analyzer, intent_detector)
+    
+    # Update context with analysis
+    context.update_sentiment(sentiment_result)
+    context.update_intent(intent_result)
+    
+    # Check for crisis keywords
+    crisis_check = gpt_handler.detect_crisis_keywords(message_text)
+    
+    # Determine conversation type
+    conversation_type = 'crisis' if crisis_check['is_crisis'] else intent_result.get('primary_intent', 'general')
+    
+    gpt_request = {
+        'user_message': message_text,
+        'conversation_history': context.get_conversation_history(limit=10),
+        'context': {'context_summary': context.get_context_for_gpt()},
+        'conversation_type': conversation_type
+    }
+    return user_message, sentiment_result, intent_result, crisis_check, gpt_request
+
+def _finish_turn(session_id, chat_session, context, user_message, sentiment_result,
+                 intent_result, crisis_check, gpt_response, async_recommendations=False):
+    """Save both sides of a turn and build the response payload"""
+    bot_response_text = gpt_response['response']
+    
+    # Save bot response
+    bot_message = Message(
+        session_id=chat_session.id,
+        sender='bot',
+        content=bot_response_text,
+        message_type='text',
+        message_metadata={
+            'sentiment': sentiment_result,
+            'intent': intent_result,
+            'crisis_check': crisis_check,
+            'gpt_metadata': gpt_response
+        }
+    )
+    db.session.add_all([user_message, bot_message])
+    
+    # Add bot response to context
+    context.add_message('bot', bot_response_text)
+    
+    # Update chat session
+    chat_session.context_data = serialize_context(context).decode()
+    chat_session.mood_detected = sentiment_result.get('sentiment_label')
+    chat_session.sentiment_score = sentiment_result.get('polarity')
+    
+    db.session.commit()
+    context_store.set(session_id, context)
+    
+    # Generate recommendations if appropriate; clients that opt in poll for them after the reply
+    recommendations = []
+    recommendations_task_id = recommendations_url = None
+    inputs = recommendation_inputs(sentiment_result, intent_result)
+    if inputs:
+        user_profile, current_context = inputs
+        # Queued results are tied to the session's user, so anonymous sessions get them inline
+        if async_recommendations and chat_session.user_id is not None:
+            recommendations_task_id = enqueue_recommendations(
+                recommendation_engine, user_profile, current_context, chat_session.user_id
+            )
+            recommendations_url = url_for('chat.get_queued_recommendations', task_id=recommendations_task_id)
+        else:
+            recommendations = recommendation_engine.generate_recommendations(
+                user_profile=user_profile,
+                current_context=current_context
+            )
+    
+    # Check if escalation is needed
+    escalation_needed = (
+        crisis_check['is_crisis'] or 
+        intent_result.get('urgency_level') == 'high' or
+        sentiment_result.get('risk_level') == 'high'
+    )
+    
+    return {
+        'message': bot_response_text,
+        'sentiment': sentiment_result,
+        'intent': intent_result,
+        'crisis_detected': crisis_check['is_crisis'],
+        'escalation_needed': escalation_needed,
+        'recommendations': recommendations[:RECOMMENDATION_LIMIT],
+        'recommendations_task_id': recommendations_task_id,
+        'recommendations_url': recommendations_url,
+        'conversation_context': context.get_context_summary()
+    }
+
+def _sse_event(data, event=None):
+    """Format a payload as a server-sent event"""
+    payload = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+    return f"event: {event}\ndata: {payload}\n\n" if event else f"data: {payload}\n\n"
+
+def _load_turn(session_id):
+    """Message text, chat session and context for a new turn, or an error response"""
     data = request.get_json()
     message_text = data.get('message', '').strip()
     
     if not message_text:
-        return jsonify({'error': 'Message cannot be empty'}), 400
+        return None, None, None, (jsonify({'error': 'Message cannot be empty'}), 400)
     
     # Get chat session
-    chat_session = ChatSession.query.filter_by(session_id=session_id).first()
+    chat_session = get_chat_session(session_id)
     if not chat_session:
-        return jsonify({'error': 'Session not found'}), 404
+        return None, None, None, (jsonify({'error': 'Session not found'}), 404)
     
     # Get conversation context
-    context = conversation_contexts.get(session_id)
+    context = load_context(session_id, chat_session)
     if not context:
         context = ConversationContext()
         context.initialize_session(session_id, chat_session.user_id)
-        conversation_contexts[session_id] = context
+    return message_text, chat_session, context, None
+
+@chat_bp.route('/api/session/<session_id>/message', methods=['POST'])
+def send_message(session_id):
+    """Send a message to the chatbot"""
+    message_text, chat_session, context, error = _load_turn(session_id)
+    if error:
+        return error
     
     try:
-        # Save user message
-        user_message = Message(
-            session_id=chat_session.id,
-            sender='user',
-            content=message_text,
-            message_type='text'
-        )
-        db.session.add(user_message)
-        
-        # Add to conversation context
-        context.add_message('user', message_text)
-        
-        # Analyze message
-        sentiment_result = sentiment_analyzer.analyze_sentiment(message_text)
-        intent_result = intent_detector.detect_intent(message_text)
-        
-        # Update context with analysis
-        context.update_sentiment(sentiment_result)
-        context.update_intent(intent_result)
-        
-        # Check for crisis keywords
-        crisis_check = gpt_handler.detect_crisis_keywords(message_text)
-        
-        # Determine conversation type
-        conversation_type = 'crisis' if crisis_check['is_crisis'] else intent_result.get('primary_intent', 'general')
+        user_message, sentiment_result, intent_result, crisis_check, gpt_request = \
+            _prepare_turn(chat_session, context, message_text)
         
         # Generate GPT response
-        conversation_history = context.get_conversation_history(limit=10)
-        context_summary = context.get_context_for_gpt()
-        
-        gpt_response = gpt_handler.generate_response(
-            user_message=message_text,
-            conversation_history=conversation_history,
-            context={'context_summary': context_summary},
-            conversation_type=conversation_type
-        )
-        
-        bot_response_text = gpt_response['response']
-        
-        # Save bot response
-        bot_message = Message(
-            session_id=chat_session.id,
-            sender='bot',
-            content=bot_response_text,
-            message_type='text',
-            metadata=json.dumps({
-                'sentiment': sentiment_result,
-                'intent': intent_result,
-                'crisis_check': crisis_check,
-                'gpt_metadata': gpt_response
-            })
-        )
-        db.session.add(bot_message)
-        
-        # Add bot response to context
-        context.add_message('bot', bot_response_text)
-        
-        # Update chat session
-        chat_session.context_data = json.dumps(context.to_dict())
-        chat_session.mood_detected = sentiment_result.get('sentiment_label')
-        chat_session.sentiment_score = sentiment_result.get('polarity')
-        
-        db.session.commit()
-        
-        # Generate recommendations if appropriate
-        recommendations = []
-        if intent_result.get('primary_intent') == 'recommendation_request' or sentiment_result.get('risk_level') == 'medium':
-            user_profile = {
-                'mental_health_status': 'healthy',  # This would come from user data
-                'mood_score': int((sentiment_result.get('polarity', 0) + 1) * 5),  # Convert -1,1 to 1,10
-                'stress_level': 5,  # This would come from user data
-                'preferences': {}
-            }
-            
-            current_context = {
-                'current_mood': sentiment_result.get('sentiment_label', 'neutral'),
-                'time_of_day': datetime.now().strftime('%H:%M'),
-                'available_time': 30
-            }
-            
-            recommendations = recommendation_engine.generate_recommendations(
-                user_profile=user_profile,
-                current_context=current_context
-            )
-        
-        # Check if escalation is needed
-        escalation_needed = (
-            crisis_check['is_crisis'] or 
-            intent_result.get('urgency_level') == 'high' or
-            sentiment_result.get('risk_level') == 'high'
-        )
+        gpt_response = gpt_handler.generate_response(**gpt_request)
         
-        response_data = {
-            'message': bot_response_text,
-            'sentiment': sentiment_result,
-            'intent': intent_result,
-            'crisis_detected': crisis_check['is_crisis'],
-            'escalation_needed': escalation_needed,
-            'recommendations': recommendations[:3],  # Limit to 3 recommendations
-            'conversation_context': context.get_context_summary()
-        }
-        
-        return jsonify(response_data)
+        return jsonify(_finish_turn(session_id, chat_session, context, user_message,
+                                    sentiment_result, intent_result, crisis_check, gpt_response,
+                                    async_recommendations=request.get_json().get('async_recommendations', False)))
         
     except Exception as e:
         db.session.rollback()
@@ -203,10 +257,48 @@ def send_message(session_id):
             'message': 'I apologize, but I encountered an error. Please try again.'
         }), 500
 
+@chat_bp.route('/api/session/<session_id>/message/stream', methods=['POST'])
+def stream_message(session_id):
+    """Send a message to the chatbot and stream the reply as server-sent events"""
+    message_text, chat_session, context, error = _load_turn(session_id)
+    if error:
+        return error
+    async_recommendations = request.get_json().get('async_recommendations', False)
+    
+    def generate():
+        try:
+            user_message, sentiment_result, intent_result, crisis_check, gpt_request = \
+                _prepare_turn(chat_session, context, message_text)
+            
+            gpt_response = None
+            for event, value in gpt_handler.stream_response(**gpt_request):
+                if event == 'delta':
+                    yield _sse_event({'delta': value})
+                else:
+                    gpt_response = value
+            
+            # The turn is only persisted once the full reply is known
+            response_data = _finish_turn(session_id, chat_session, context, user_message,
+                                         sentiment_result, intent_result, crisis_check, gpt_response,
+                                         async_recommendations=async_recommendations)
+            yield _sse_event(response_data, 'done')
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error streaming message: {e}")
+            error_data = {
+                'error': 'Failed to process message',
+                'message': 'I apologize, but I encountered an error. Please try again.'
+            }
+            yield _sse_event(error_data, 'error')
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @chat_bp.route('/api/session/<session_id>/history')
 def get_chat_history(session_id):
     """Get chat history for a session"""
-    chat_session = ChatSession.query.filter_by(session_id=session_id).first()
+    chat_session = get_chat_session(session_id)
     if not chat_session:
         return jsonify({'error': 'Session not found'}), 404
     
@@ -217,18 +309,29 @@ def get_chat_history(session_id):
     elif not chat_session.is_anonymous and not current_user.is_authenticated:
         return jsonify({'error': 'Authentication required'}), 401
     
-    messages = Message.query.filter_by(session_id=chat_session.id).order_by(Message.created_at).all()
+    # Bot metadata carries the full analysis and GPT payload; clients that don't need it can skip reading it
+    include_metadata = request.args.get('include_metadata', 'true').lower() not in ['false', 'off', '0']
+    columns = [Message.id, Message.sender, Message.content, Message.message_type, Message.created_at]
+    if include_metadata:
+        columns.append(Message.message_metadata)
+    
+    messages = db.session.execute(
+        db.select(*columns)
+        .where(Message.session_id == chat_session.id)
+        .order_by(Message.created_at)
+    ).all()
     
-    history = []
-    for msg in messages:
-        history.append({
+    history = [
+        {
             'id': msg.id,
             'sender': msg.sender,
             'content': msg.content,
             'message_type': msg.message_type,
             'timestamp': msg.created_at.isoformat(),
-            'metadata': msg.get_metadata()
-        })
+            'metadata': (msg.message_metadata or {}) if include_metadata else None
+        }
+        for msg in messages
+    ]
     
     return jsonify({
         'session_id': session_id,
@@ -239,7 +342,7 @@ def get_chat_history(session_id):
 @chat_bp.route('/api/session/<session_id>/context')
 def get_conversation_context(session_id):
     """Get conversation context for a session"""
-    context = conversation_contexts.get(session_id)
+    context = load_context(session_id)
     if not context:
         return jsonify({'error': 'Context not found'}), 404
     
@@ -267,6 +370,17 @@ def get_recommendations(session_id):
         'session_id': session_id
     })
 
+@chat_bp.route('/api/recommendations/<task_id>')
+@login_required
+def get_queued_recommendations(task_id):
+    """Poll for recommendations queued by one of the current user's chat messages"""
+    result = get_recommendation_result(task_id, current_user.id)
+    if result is None:
+        return jsonify({'error': 'Recommendations not found'}), 404
+    if result['status'] == 'pending':
+        return jsonify(result), 202
+    return jsonify(result)
+
 @chat_bp.route('/api/session/<session_id>/assessment/start', methods=['POST'])
 def start_assessment(session_id):
     """Start a mental health assessment"""
@@ -274,7 +388,7 @@ def start_assessment(session_id):
     assessment_type = data.get('type', 'PHQ-9')
     
     # Get conversation context
-    context = conversation_contexts.get(session_id)
+    context = load_context(session_id)
     if not context:
         return jsonify({'error': 'Session context not found'}), 404
     
@@ -283,6 +397,7 @@ def start_assessment(session_id):
     
     # Start assessment in context
     context.start_assessment(assessment_type, questions)
+    context_store.set(session_id, context)
     
     return jsonify({
         'assessment_type': assessment_type,
@@ -298,12 +413,13 @@ def submit_assessment_response(session_id):
     response = data.get('response')
     
     # Get conversation context
-    context = conversation_contexts.get(session_id)
+    context = load_context(session_id)
     if not context:
         return jsonify({'error': 'Session context not found'}), 404
     
     # Add response to context
     context.add_assessment_response(question_id, response)
+    context_store.set(session_id, context)
     
     return jsonify({'message': 'Response recorded'})
 
@@ -311,7 +427,7 @@ def submit_assessment_response(session_id):
 def complete_assessment(session_id):
     """Complete assessment and get results"""
     # Get conversation context
-    context = conversation_contexts.get(session_id)
+    context = load_context(session_id)
     if not context:
         return jsonify({'error': 'Session context not found'}), 404
     
@@ -319,6 +435,7 @@ def complete_assessment(session_id):
     assessment_data = context.complete_assessment()
     if not assessment_data:
         return jsonify({'error': 'No assessment in progress'}), 400
+    context_store.set(session_id, context)
     
     # Analyze responses
     assessment_type = assessment_data['type']
@@ -353,7 +470,7 @@ def export_chat_history(session_id):
     """Export chat history as CSV or PDF"""
     format_type = request.args.get('format', 'csv')
     
-    chat_session = ChatSession.query.filter_by(session_id=session_id).first()
+    chat_session = get_chat_session(session_id)
     if not chat_session:
         return jsonify({'error': 'Session not found'}), 404
     
@@ -364,32 +481,33 @@ def export_chat_history(session_id):
     elif not chat_session.is_anonymous and not current_user.is_authenticated:
         return jsonify({'error': 'Authentication required'}), 401
     
-    messages = Message.query.filter_by(session_id=chat_session.id).order_by(Message.created_at).all()
-    
     if format_type == 'csv':
-        import csv
-        import io
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Timestamp', 'Sender', 'Message', 'Type'])
-        
-        # Write messages
-        for msg in messages:
-            writer.writerow([
-                msg.created_at.isoformat(),
-                msg.sender,
-                msg.content,
-                msg.message_type
-            ])
+        messages_query = (
+            db.select(Message.created_at, Message.sender, Message.content, Message.message_type)
+            .where(Message.session_id == chat_session.id)
+            .order_by(Message.created_at)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
         
-        output.seek(0)
+        def generate():
+            # One buffer per export, drained after every batch
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(['Timestamp', 'Sender', 'Message', 'Type'])
+            
+            for partition in db.session.execute(messages_query).partitions():
+                writer.writerows(
+                    [created_at.isoformat(), sender, content, message_type]
+                    for created_at, sender, content, message_type in partition
+                )
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            
+            yield buffer.getvalue()
         
-        from flask import Response
         return Response(
-            output.getvalue(),
+            stream_with_context(generate()),
             mimetype='text/csv',
             headers={'Content-Disposition': f'attachment; filename=chat_history_{session_id}.csv'}
         )
@@ -404,7 +522,7 @@ def export_chat_history(session_id):
 @chat_bp.route('/api/session/<session_id>/end', methods=['POST'])
 def end_session(session_id):
     """End a chat session"""
-    chat_session = ChatSession.query.filter_by(session_id=session_id).first()
+    chat_session = get_chat_session(session_id)
     if not chat_session:
         return jsonify({'error': 'Session not found'}), 404
     
@@ -419,8 +537,7 @@ def end_session(session_id):
     chat_session.is_active = False
     db.session.commit()
     
-    # Remove from memory
-    if session_id in conversation_contexts:
-        del conversation_contexts[session_id]
+    # Drop the stored context
+    context_store.delete(session_id)
     
     return jsonify({'message': 'Session ended successfully'})
\ No newline at end of file
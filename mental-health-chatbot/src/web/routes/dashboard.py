@@ -2,17 +2,84 @@
 Dashboard Routes - User dashboard and analytics
 """
 
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, Response, render_template, request, jsonify, stream_with_context
 from flask_login import login_required, current_user
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.db.models import User, MoodEntry, Assessment, Recommendation, db
+from src.web.app import MOOD_CHART_TTL, cache, mood_chart_key
+from src.web.utils.validators import mood_fields_error
+from sqlalchemy.orm import load_only
 from datetime import datetime, timedelta
-import plotly.graph_objs as go
-import plotly.utils
-import json
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+import orjson
+import csv
+import io
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Rows fetched per round trip when streaming a CSV export
+EXPORT_BATCH_SIZE = 500
+
+# Title, y axis title, trace name and line colour of each dashboard chart
+MOOD_CHARTS = {
+    'mood_chart': ('Mood Trend Over Time', 'Mood Score (1-10)', 'Mood Score', '#3498db'),
+    'stress_chart': ('Stress Level Over Time', 'Stress Level (1-10)', 'Stress Level', '#e74c3c'),
+    'energy_chart': ('Energy Level Over Time', 'Energy Level (1-10)', 'Energy Level', '#2ecc71')
+}
+
+@lru_cache(maxsize=None)
+def _chart_layout(chart):
+    """Plotly layout for a dashboard chart, validated and expanded (template included) once"""
+    # Plotly is only needed to build these layouts, so workers skip importing it until the first chart
+    import plotly.graph_objs as go
+    
+    title, yaxis_title, _, _ = MOOD_CHARTS[chart]
+    return go.Layout(
+        title=title,
+        xaxis_title='Date',
+        yaxis_title=yaxis_title,
+        yaxis=dict(range=[1, 10]),
+        hovermode='x unified',
+        template='plotly_white'
+    ).to_plotly_json()
+
+def _chart_json(chart, dates, values):
+    """Plotly figure JSON for one series, serialized directly without building a Figure"""
+    _, _, name, color = MOOD_CHARTS[chart]
+    data = []
+    # A series with nothing recorded gets an empty chart rather than a trace of gaps
+    if not np.isnan(values).all():
+        data.append({
+            'type': 'scatter',
+            'x': dates,
+            'y': values,
+            'connectgaps': False,
+            'mode': 'lines+markers',
+            'name': name,
+            'line': {'color': color, 'width': 2},
+            'marker': {'size': 6}
+        })
+    return orjson.dumps({'data': data, 'layout': _chart_layout(chart)}, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+def _nan_average(values):
+    """Mean of the recorded (non-NaN) values, or 0 when there are none"""
+    recorded = values[~np.isnan(values)]
+    return round(float(recorded.mean()), 2) if recorded.size else 0
+
+def mood_statistics(mood, stress, energy):
+    """Averages and mood score distribution as vectorized NumPy reductions"""
+    scores, counts = np.unique(mood, return_counts=True)
+    
+    return {
+        'avg_mood': round(float(mood.mean()), 2) if mood.size else 0,
+        'avg_stress': _nan_average(stress),
+        'avg_energy': _nan_average(energy),
+        'total_entries': int(mood.size),
+        'mood_distribution': dict(zip(scores.tolist(), counts.tolist()))
+    }
+
 @dashboard_bp.route('/')
 @login_required
 def index():
@@ -24,104 +91,50 @@ def index():
 def get_mood_data():
     """Get mood tracking data for charts"""
     days = request.args.get('days', 30, type=int)
-    start_date = datetime.now() - timedelta(days=days)
-    
-    # Get mood entries for the period
-    mood_entries = MoodEntry.query.filter(
-        MoodEntry.user_id == current_user.id,
-        MoodEntry.created_at >= start_date
-    ).order_by(MoodEntry.created_at).all()
-    
-    # Prepare data for charts
-    dates = [entry.created_at.strftime('%Y-%m-%d') for entry in mood_entries]
-    mood_scores = [entry.mood_score for entry in mood_entries]
-    stress_levels = [entry.stress_level for entry in mood_entries if entry.stress_level]
-    energy_levels = [entry.energy_level for entry in mood_entries if entry.energy_level]
-    
-    # Create mood trend chart
-    mood_chart = go.Figure()
-    mood_chart.add_trace(go.Scatter(
-        x=dates,
-        y=mood_scores,
-        mode='lines+markers',
-        name='Mood Score',
-        line=dict(color='#3498db', width=2),
-        marker=dict(size=6)
-    ))
-    
-    mood_chart.update_layout(
-        title='Mood Trend Over Time',
-        xaxis_title='Date',
-        yaxis_title='Mood Score (1-10)',
-        yaxis=dict(range=[1, 10]),
-        hovermode='x unified',
-        template='plotly_white'
-    )
-    
-    # Create stress level chart
-    stress_chart = go.Figure()
-    if stress_levels:
-        stress_chart.add_trace(go.Scatter(
-            x=dates[:len(stress_levels)],
-            y=stress_levels,
-            mode='lines+markers',
-            name='Stress Level',
-            line=dict(color='#e74c3c', width=2),
-            marker=dict(size=6)
-        ))
     
-    stress_chart.update_layout(
-        title='Stress Level Over Time',
-        xaxis_title='Date',
-        yaxis_title='Stress Level (1-10)',
-        yaxis=dict(range=[1, 10]),
-        hovermode='x unified',
-        template='plotly_white'
-    )
+    # Charts only change when the user's mood entries do, which moves them to a new key
+    key = mood_chart_key(current_user.id, days)
+    mood_data = cache.get(key)
+    if mood_data is None:
+        mood_data = build_mood_data(current_user.id, days)
+        cache.set(key, mood_data, timeout=MOOD_CHART_TTL)
     
-    # Create energy level chart
-    energy_chart = go.Figure()
-    if energy_levels:
-        energy_chart.add_trace(go.Scatter(
-            x=dates[:len(energy_levels)],
-            y=energy_levels,
-            mode='lines+markers',
-            name='Energy Level',
-            line=dict(color='#2ecc71', width=2),
-            marker=dict(size=6)
-        ))
+    return jsonify(mood_data)
+
+def build_mood_data(user_id, days):
+    """Build the mood, stress and energy charts and statistics for a period"""
+    start_date = datetime.now() - timedelta(days=days)
     
-    energy_chart.update_layout(
-        title='Energy Level Over Time',
-        xaxis_title='Date',
-        yaxis_title='Energy Level (1-10)',
-        yaxis=dict(range=[1, 10]),
-        hovermode='x unified',
-        template='plotly_white'
-    )
+    # Only the plotted columns, as plain rows served by the (user_id, created_at) index
+    mood_entries = db.session.execute(
+        db.select(MoodEntry.created_at, MoodEntry.mood_score, MoodEntry.stress_level, MoodEntry.energy_level)
+        .where(MoodEntry.user_id == user_id, MoodEntry.created_at >= start_date)
+        .order_by(MoodEntry.created_at)
+    ).all()
     
-    # Calculate statistics
-    avg_mood = sum(mood_scores) / len(mood_scores) if mood_scores else 0
-    avg_stress = sum(stress_levels) / len(stress_levels) if stress_levels else 0
-    avg_energy = sum(energy_levels) / len(energy_levels) if energy_levels else 0
+    # Parallel arrays from one pass; unrecorded stress/energy stay NaN so every point keeps its date
+    n = len(mood_entries)
+    dates = np.empty(n, dtype='datetime64[D]')
+    mood_scores = np.empty(n, dtype=np.int64)
+    stress_levels = np.full(n, np.nan)
+    energy_levels = np.full(n, np.nan)
+    for i, entry in enumerate(mood_entries):
+        dates[i] = entry.created_at.date()
+        mood_scores[i] = entry.mood_score
+        if entry.stress_level is not None:
+            stress_levels[i] = entry.stress_level
+        if entry.energy_level is not None:
+            energy_levels[i] = entry.energy_level
     
-    # Mood distribution
-    mood_distribution = {}
-    for score in mood_scores:
-        mood_distribution[score] = mood_distribution.get(score, 0) + 1
+    # ISO date strings shared by all three charts
+    chart_dates = np.datetime_as_string(dates).tolist()
     
-    return jsonify({
-        'mood_chart': json.dumps(mood_chart, cls=plotly.utils.PlotlyJSONEncoder),
-        'stress_chart': json.dumps(stress_chart, cls=plotly.utils.PlotlyJSONEncoder),
-        'energy_chart': json.dumps(energy_chart, cls=plotly.utils.PlotlyJSONEncoder),
-        'statistics': {
-            'avg_mood': round(avg_mood, 2),
-            'avg_stress': round(avg_stress, 2),
-            'avg_energy': round(avg_energy, 2),
-            'total_entries': len(mood_entries),
-            'mood_distribution': mood_distribution
-        }
-    })
+    return {
+        'mood_chart': _chart_json('mood_chart', chart_dates, mood_scores),
+        'stress_chart': _chart_json('stress_chart', chart_dates, stress_levels),
+        'energy_chart': _chart_json('energy_chart', chart_dates, energy_levels),
+        'statistics': mood_statistics(mood_scores, stress_levels, energy_levels)
+    }
 
 @dashboard_bp.route('/api/assessment-history')
 @login_required
@@ -175,6 +188,10 @@ def add_mood_entry():
     """Add a new mood entry"""
     data = request.get_json()
     
+    error = mood_fields_error([data])
+    if error:
+        return jsonify({'error': error}), 400
+    
     try:
         mood_entry = MoodEntry(
             user_id=current_user.id,
@@ -276,47 +293,73 @@ def export_user_data():
     format_type = request.args.get('format', 'csv')
     
     if format_type == 'csv':
-        import csv
-        import io
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Export mood entries
-        writer.writerow(['Data Type', 'Date', 'Mood Score', 'Mood Label', 'Stress Level', 'Energy Level', 'Sleep Hours', 'Notes'])
-        
-        mood_entries = MoodEntry.query.filter_by(user_id=current_user.id).order_by(MoodEntry.created_at).all()
-        for entry in mood_entries:
-            writer.writerow([
-                'Mood Entry',
-                entry.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                entry.mood_score,
-                entry.mood_label,
-                entry.stress_level or '',
-                entry.energy_level or '',
-                entry.sleep_hours or '',
-                entry.notes or ''
-            ])
-        
-        # Export assessments
-        assessments = Assessment.query.filter_by(user_id=current_user.id).order_by(Assessment.created_at).all()
-        for assessment in assessments:
-            writer.writerow([
-                'Assessment',
-                assessment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                assessment.total_score,
-                assessment.severity_level,
-                '',
-                '',
-                '',
-                f"{assessment.assessment_type} - {assessment.interpretation}"
-            ])
+        user_id = current_user.id
+        mood_query = (
+            db.select(
+                MoodEntry.created_at, MoodEntry.mood_score, MoodEntry.mood_label, MoodEntry.stress_level,
+                MoodEntry.energy_level, MoodEntry.sleep_hours, MoodEntry.notes
+            )
+            .where(MoodEntry.user_id == user_id)
+            .order_by(MoodEntry.created_at)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        assessment_query = (
+            db.select(Assessment)
+            # The large JSON text columns are not part of the export
+            .options(load_only(Assessment.created_at, Assessment.total_score, Assessment.severity_level, Assessment.assessment_type))
+            .where(Assessment.user_id == user_id)
+            .order_by(Assessment.created_at)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
         
-        output.seek(0)
+        def generate():
+            # One buffer per export, drained after every batch
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(['Data Type', 'Date', 'Mood Score', 'Mood Label', 'Stress Level', 'Energy Level', 'Sleep Hours', 'Notes'])
+            
+            # Export mood entries
+            for partition in db.session.execute(mood_query).partitions():
+                writer.writerows(
+                    [
+                        'Mood Entry',
+                        entry.created_at.isoformat(' ', 'seconds'),
+                        entry.mood_score,
+                        entry.mood_label,
+                        entry.stress_level or '',
+                        entry.energy_level or '',
+                        entry.sleep_hours or '',
+                        entry.notes or ''
+                    ]
+                    for entry in partition
+                )
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            
+            # Export assessments
+            for partition in db.session.scalars(assessment_query).partitions():
+                writer.writerows(
+                    [
+                        'Assessment',
+                        assessment.created_at.isoformat(' ', 'seconds'),
+                        assessment.total_score,
+                        assessment.severity_level,
+                        '',
+                        '',
+                        '',
+                        f"{assessment.assessment_type} - {assessment.interpretation}"
+                    ]
+                    for assessment in partition
+                )
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            
+            yield buffer.getvalue()
         
-        from flask import Response
         return Response(
-            output.getvalue(),
+            stream_with_context(generate()),
             mimetype='text/csv',
             headers={'Content-Disposition': f'attachment; filename=mental_health_data_{current_user.username}.csv'}
         )
@@ -327,16 +370,22 @@ def export_user_data():
 @login_required
 def get_insights():
     """Get personalized insights based on user data"""
+    since = datetime.now() - timedelta(days=30)
+    
     # Get recent mood data
-    recent_mood_entries = MoodEntry.query.filter(
-        MoodEntry.user_id == current_user.id,
-        MoodEntry.created_at >= datetime.now() - timedelta(days=30)
+    recent_mood_entries = db.session.execute(
+        db.select(MoodEntry.mood_score, MoodEntry.activities).where(
+            MoodEntry.user_id == current_user.id,
+            MoodEntry.created_at >= since
+        )
     ).all()
     
     # Get recent assessments
-    recent_assessments = Assessment.query.filter(
-        Assessment.user_id == current_user.id,
-        Assessment.created_at >= datetime.now() - timedelta(days=30)
+    recent_assessments = db.session.execute(
+        db.select(Assessment.assessment_type, Assessment.severity_level).where(
+            Assessment.user_id == current_user.id,
+            Assessment.created_at >= since
+        ).order_by(Assessment.created_at)
     ).all()
     
     insights = []
@@ -373,16 +422,14 @@ def get_insights():
             })
     
     # Activity insights
-    all_activities = []
-    for entry in recent_mood_entries:
-        all_activities.extend(entry.get_activities())
+    activity_counts = Counter(
+        activity
+        for entry in recent_mood_entries if entry.activities
+        for activity in orjson.loads(entry.activities)
+    )
     
-    if all_activities:
-        activity_counts = {}
-        for activity in all_activities:
-            activity_counts[activity] = activity_counts.get(activity, 0) + 1
-        
-        most_common_activity = max(activity_counts, key=activity_counts.get)
+    if activity_counts:
+        most_common_activity = activity_counts.most_common(1)[0][0]
         insights.append({
             'type': 'info',
             'title': 'Activity Pattern',
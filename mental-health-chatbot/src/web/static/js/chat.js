@@ -126,32 +126,61 @@ class ChatInterface {
         this.showTypingIndicator();
         
         try {
-            const response = await fetch(`/api/chat/session/${this.sessionId}/message`, {
+            // The reply arrives as server-sent events: text deltas, then one "done" event
+            const response = await fetch(`/chat/api/session/${this.sessionId}/message/stream`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
                 body: JSON.stringify({
-                    message: message
+                    message: message,
+                    async_recommendations: true
                 })
             });
             
-            if (response.ok) {
-                const data = await response.json();
+            if (!response.ok || !response.body) {
                 this.hideTypingIndicator();
-                this.addMessage('bot', data.message, data);
+                this.addMessage('bot', 'I apologize, but I encountered an error. Please try again.');
+                return;
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let botContent = null;
+            
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
                 
-                // Handle special responses
-                if (data.crisis_detected) {
-                    this.handleCrisisResponse();
-                }
+                // Events are separated by a blank line; keep any partial event for the next chunk
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
                 
-                if (data.recommendations && data.recommendations.length > 0) {
-                    this.showRecommendations(data.recommendations);
+                for (const raw of events) {
+                    const event = this.parseServerEvent(raw);
+                    if (!event) continue;
+                    
+                    if (event.type === 'message') {
+                        if (!botContent) {
+                            this.hideTypingIndicator();
+                            botContent = this.addMessage('bot', '');
+                        }
+                        botContent.textContent += event.data.delta;
+                        this.scrollToBottom();
+                    } else if (event.type === 'done') {
+                        this.hideTypingIndicator();
+                        if (!botContent) {
+                            botContent = this.addMessage('bot', '');
+                        }
+                        botContent.textContent = event.data.message;
+                        this.handleReplyData(event.data);
+                    } else if (event.type === 'error') {
+                        this.hideTypingIndicator();
+                        this.addMessage('bot', event.data.message);
+                    }
                 }
-            } else {
-                this.hideTypingIndicator();
-                this.addMessage('bot', 'I apologize, but I encountered an error. Please try again.');
             }
         } catch (error) {
             console.error('Error sending message:', error);
@@ -160,6 +189,34 @@ class ChatInterface {
         }
     }
     
+    parseServerEvent(raw) {
+        let type = 'message';
+        let data = '';
+        for (const line of raw.split('\n')) {
+            if (line.startsWith('event: ')) {
+                type = line.slice(7);
+            } else if (line.startsWith('data: ')) {
+                data += line.slice(6);
+            }
+        }
+        return data ? { type: type, data: JSON.parse(data) } : null;
+    }
+    
+    handleReplyData(data) {
+        // Handle special responses
+        if (data.crisis_detected) {
+            this.handleCrisisResponse();
+        }
+        
+        if (data.recommendations && data.recommendations.length > 0) {
+            this.showRecommendations(data.recommendations);
+        }
+        
+        if (data.recommendations_url) {
+            this.pollRecommendations(data.recommendations_url);
+        }
+    }
+    
     addMessage(sender, content, metadata = {}) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${sender}`;
@@ -182,6 +239,8 @@ class ChatInterface {
             this.messageCount++;
             this.updateStats();
         }
+        
+        return messageContent;
     }
     
     showTypingIndicator() {
@@ -441,6 +500,30 @@ class ChatInterface {
         }
     }
     
+    async pollRecommendations(url, attempts = 10) {
+        // Recommendations are generated in the background after the reply is sent;
+        // the server returns the poll URL of the endpoint that queued them
+        for (let i = 0; i < attempts; i++) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            try {
+                const response = await fetch(url);
+                if (response.status === 202) {
+                    continue;
+                }
+                if (response.ok) {
+                    const data = await response.json();
+                    if (data.recommendations && data.recommendations.length > 0) {
+                        this.showRecommendations(data.recommendations);
+                    }
+                }
+                return;
+            } catch (error) {
+                console.error('Error polling recommendations:', error);
+                return;
+            }
+        }
+    }
+    
     toggleVoiceInput() {
         // Voice input functionality would be implemented here
         console.log('Voice input not implemented yet');
@@ -4,6 +4,7 @@ Web Utilities Package
 
 from .auth_utils import generate_confirmation_token, confirm_token
 from .validators import validate_email, validate_password, validate_username
-from .helpers import send_email, format_datetime, format_duration
+from .helpers import send_email, send_email_async, format_datetime, format_duration
+from .nlp_cache import cached_nlp, analyze_message
 
-__all__ = ['generate_confirmation_token', 'confirm_token', 'validate_email', 'validate_password', 'validate_username', 'send_email', 'format_datetime', 'format_duration']
\ No newline at end of file
+__all__ = ['generate_confirmation_token', 'confirm_token', 'validate_email', 'validate_password', 'validate_username', 'send_email', 'send_email_async', 'format_datetime', 'format_duration', 'cached_nlp', 'analyze_message']
\ No newline at end of file
@@ -3,14 +3,20 @@ Authentication Utilities
 """
 
 import jwt
-from datetime import datetime, timedelta
+import time
 from flask import current_app
 
+# Seconds an email confirmation token stays valid
+CONFIRMATION_TOKEN_TTL = 86400
+
+# Seconds a password reset token stays valid
+PASSWORD_RESET_TOKEN_TTL = 3600
+
 def generate_confirmation_token(email):
     """Generate email confirmation token"""
     payload = {
         'email': email,
-        'exp': datetime.utcnow() + timedelta(hours=24)
+        'exp': int(time.time()) + CONFIRMATION_TOKEN_TTL
     }
     return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
 
@@ -28,7 +34,7 @@ def generate_password_reset_token(email):
     """Generate password reset token"""
     payload = {
         'email': email,
-        'exp': datetime.utcnow() + timedelta(hours=1)
+        'exp': int(time.time()) + PASSWORD_RESET_TOKEN_TTL
     }
     return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
 
@@ -0,0 +1,108 @@
+"""
+Conversation Context Store - share chat contexts across workers
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import orjson
+import redis
+from flask import current_app
+from src.nlp.conversation_context import ConversationContext
+
+# Seconds an idle conversation context is kept in Redis
+CONTEXT_TTL = 1800
+
+# Contexts kept in process when Redis is not configured or unreachable
+CONTEXT_LOCAL_MAXSIZE = int(os.environ.get('CONTEXT_LRU_SIZE', '10000'))
+
+def serialize_context(context):
+    """Encode a conversation context as JSON bytes"""
+    return orjson.dumps(context.to_dict(), option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+def deserialize_context(raw):
+    """Rebuild a conversation context from JSON"""
+    context = ConversationContext()
+    context.from_dict(orjson.loads(raw))
+    return context
+
+class ContextStore:
+    """Conversation contexts in Redis, falling back to a bounded in-process LRU"""
+
+    def __init__(self, ttl=CONTEXT_TTL, local_maxsize=CONTEXT_LOCAL_MAXSIZE):
+        self.ttl = ttl
+        self.local_maxsize = local_maxsize
+        self._local = OrderedDict()
+        self._local_lock = threading.Lock()
+        self._client = None
+
+    @staticmethod
+    def _key(session_id):
+        """Redis key for a session, so raw session ids never appear in the keyspace"""
+        return f'ctx:{hashlib.sha256(session_id.encode()).hexdigest()[:32]}'
+
+    def _redis(self):
+        """Redis client for REDIS_URL, or None when it is not configured"""
+        if self._client is None and current_app.config.get('REDIS_URL'):
+            self._client = redis.from_url(current_app.config['REDIS_URL'])
+        return self._client
+
+    def get(self, session_id):
+        """Load the context for a session, or None if it has expired or never existed"""
+        key = self._key(session_id)
+        client = self._redis()
+        raw = None
+        if client is not None:
+            try:
+                # Reading a context counts as activity, so push its expiry back
+                raw = client.getex(key, ex=self.ttl)
+            except redis.RedisError as e:
+                print(f"Error reading conversation context: {e}")
+                raw = self._local_get(key)
+        else:
+            raw = self._local_get(key)
+
+        return deserialize_context(raw) if raw is not None else None
+
+    def set(self, session_id, context):
+        """Save the context for a session"""
+        key = self._key(session_id)
+        raw = serialize_context(context)
+        client = self._redis()
+        if client is not None:
+            try:
+                client.set(key, raw, ex=self.ttl)
+                return
+            except redis.RedisError as e:
+                print(f"Error saving conversation context: {e}")
+        self._local_set(key, raw)
+
+    def delete(self, session_id):
+        """Drop the context for a session"""
+        key = self._key(session_id)
+        with self._local_lock:
+            self._local.pop(key, None)
+        client = self._redis()
+        if client is not None:
+            try:
+                client.delete(key)
+            except redis.RedisError as e:
+                print(f"Error deleting conversation context: {e}")
+
+    def _local_get(self, key):
+        with self._local_lock:
+            raw = self._local.get(key)
+            if raw is not None:
+                self._local.move_to_end(key)
+            return raw
+
+    def _local_set(self, key, raw):
+        with self._local_lock:
+            self._local[key] = raw
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_maxsize:
+                self._local.popitem(last=False)
+
+# Shared by every chat route in the process
+context_store = ContextStore()
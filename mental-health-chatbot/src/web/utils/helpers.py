@@ -2,34 +2,105 @@
 Helper Utilities
 """
 
-from flask import render_template
-from flask_mail import Message
+from flask import render_template, current_app
+from src.web.utils.validators import strip_non_digits
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import math
+import os
 import re
+import secrets
+import string
+import time
+import uuid
+
+# Patterns compiled once at import
+FILENAME_UNSAFE_RE = re.compile(r'[^\w\-_\.]')
+UNDERSCORES_RE = re.compile(r'_+')
+URL_RE = re.compile(
+    r'^https?://'  # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
+    r'localhost|'  # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
+    r'(?::\d+)?'  # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+HTML_TAG_RE = re.compile(r'<.*?>')
+MENTION_RE = re.compile(r'@(\w+)')
+HASHTAG_RE = re.compile(r'#(\w+)')
+
+# Longest URL is_valid_url will match, bounding the work done on untrusted input
+MAX_URL_LENGTH = 2048
+
+# Characters generate_random_string draws from
+RANDOM_STRING_ALPHABET = string.ascii_letters + string.digits
+
+# Singular and plural unit words, indexed by whether the count is not 1
+MINUTE_WORDS = ('minute', 'minutes')
+HOUR_WORDS = ('hour', 'hours')
+
+# File size units, each 1024 times the previous
+FILE_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+# Emoji for each whole mood score from 0 to 10
+MOOD_EMOJIS = ('😢',) * 3 + ('😔',) * 2 + ('😐',) * 2 + ('😊',) * 2 + ('😄',) * 2
+
+# Badge color for each whole stress level from 0 to 10: green, yellow, red
+STRESS_LEVEL_COLORS = ('success',) * 4 + ('warning',) * 3 + ('danger',) * 4
+
+# Badge color for each assessment severity level
+SEVERITY_COLORS = {
+    'minimal': 'success',
+    'mild': 'info',
+    'moderate': 'warning',
+    'severe': 'danger',
+    'moderately_severe': 'danger'
+}
+
+# Timestamp format used across templates and exports
+DEFAULT_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Delivers queued emails so request threads never wait on the SMTP server
+_email_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='email')
 
 def send_email(to, subject, template, **kwargs):
-    """Send email using Flask-Mail"""
-    from flask import current_app
-    from flask_mail import mail
+    """Render an email template and queue it for background delivery"""
+    return send_email_async(to, subject, html=render_template(template, **kwargs))
+
+def _deliver_email(app, msg):
+    """Send a queued email inside the app context"""
+    with app.app_context():
+        try:
+            app.extensions['mail'].send(msg)
+        except Exception as e:
+            print(f"Error sending email: {e}")
+
+def send_email_async(to, subject, body=None, html=None):
+    """Queue an email for background delivery"""
+    app = current_app._get_current_object()
+    # Mail is only initialised when credentials are configured
+    if 'mail' not in app.extensions:
+        return False
+    
+    # Imported here so non-web users of these helpers skip loading Flask-Mail
+    from flask_mail import Message
     
     msg = Message(
         subject=subject,
         recipients=[to],
-        html=render_template(template, **kwargs),
-        sender=current_app.config.get('MAIL_USERNAME')
+        body=body,
+        html=html,
+        sender=app.config.get('MAIL_USERNAME')
     )
-    
-    try:
-        mail.send(msg)
-        return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        return False
+    _email_executor.submit(_deliver_email, app, msg)
+    return True
 
-def format_datetime(dt, format='%Y-%m-%d %H:%M:%S'):
+def format_datetime(dt, format=DEFAULT_DATETIME_FORMAT):
     """Format datetime object"""
     if dt is None:
         return ''
+    # The default format is built directly, skipping strftime's format parsing
+    if format == DEFAULT_DATETIME_FORMAT:
+        return f'{dt.year:04d}-{dt.month:02d}-{dt.day:02d} {dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}'
     return dt.strftime(format)
 
 def format_duration(seconds):
@@ -38,29 +109,27 @@ def format_duration(seconds):
         return f"{int(seconds)} seconds"
     elif seconds < 3600:
         minutes = int(seconds / 60)
-        return f"{minutes} minute{'s' if minutes != 1 else ''}"
+        return f"{minutes} {MINUTE_WORDS[minutes != 1]}"
     else:
         hours = int(seconds / 3600)
         minutes = int((seconds % 3600) / 60)
         if minutes == 0:
-            return f"{hours} hour{'s' if hours != 1 else ''}"
+            return f"{hours} {HOUR_WORDS[hours != 1]}"
         else:
-            return f"{hours} hour{'s' if hours != 1 else ''} {minutes} minute{'s' if minutes != 1 else ''}"
+            return f"{hours} {HOUR_WORDS[hours != 1]} {minutes} {MINUTE_WORDS[minutes != 1]}"
 
 def format_file_size(bytes_size):
     """Format file size in bytes to human readable format"""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if bytes_size < 1024.0:
-            return f"{bytes_size:.1f} {unit}"
-        bytes_size /= 1024.0
-    return f"{bytes_size:.1f} TB"
+    # Each unit spans 10 bits, so the bit length picks the unit without a loop
+    unit = min((max(int(bytes_size), 1).bit_length() - 1) // 10, len(FILE_SIZE_UNITS) - 1)
+    return f"{bytes_size / (1 << (10 * unit)):.1f} {FILE_SIZE_UNITS[unit]}"
 
 def sanitize_filename(filename):
     """Sanitize filename for safe storage"""
     # Remove or replace dangerous characters
-    filename = re.sub(r'[^\w\-_\.]', '_', filename)
+    filename = FILENAME_UNSAFE_RE.sub('_', filename)
     # Remove multiple underscores
-    filename = re.sub(r'_+', '_', filename)
+    filename = UNDERSCORES_RE.sub('_', filename)
     # Remove leading/trailing underscores
     filename = filename.strip('_')
     return filename
@@ -92,36 +161,15 @@ def get_time_ago(dt):
 
 def get_mood_emoji(mood_score):
     """Get emoji for mood score"""
-    if mood_score >= 9:
-        return "😄"
-    elif mood_score >= 7:
-        return "😊"
-    elif mood_score >= 5:
-        return "😐"
-    elif mood_score >= 3:
-        return "😔"
-    else:
-        return "😢"
+    return MOOD_EMOJIS[min(max(math.floor(mood_score), 0), 10)]
 
 def get_stress_level_color(level):
     """Get color for stress level"""
-    if level <= 3:
-        return "success"  # Green
-    elif level <= 6:
-        return "warning"  # Yellow
-    else:
-        return "danger"   # Red
+    return STRESS_LEVEL_COLORS[min(max(math.ceil(level), 0), 10)]
 
 def get_severity_color(severity):
     """Get color for severity level"""
-    color_map = {
-        'minimal': 'success',
-        'mild': 'info',
-        'moderate': 'warning',
-        'severe': 'danger',
-        'moderately_severe': 'danger'
-    }
-    return color_map.get(severity, 'secondary')
+    return SEVERITY_COLORS.get(severity, 'secondary')
 
 def format_phone_number(phone):
     """Format phone number for display"""
@@ -129,7 +177,7 @@ def format_phone_number(phone):
         return ''
     
     # Remove all non-digit characters
-    digits = re.sub(r'\D', '', phone)
+    digits = strip_non_digits(phone)
     
     # Format as (XXX) XXX-XXXX for US numbers
     if len(digits) == 10:
@@ -141,32 +189,30 @@ def format_phone_number(phone):
 
 def generate_random_string(length=8):
     """Generate random string of specified length"""
-    import string
-    import random
-    return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
+    return ''.join(secrets.choice(RANDOM_STRING_ALPHABET) for _ in range(length))
+
+def generate_session_id():
+    """Time-ordered UUIDv7 string, so new sessions land at the tail of the session_id index"""
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), 'big')
+    # Set the version (7) and RFC 4122 variant bits over the random part
+    value = value & ~(0xF << 76) | 0x7 << 76
+    value = value & ~(0x3 << 62) | 0x2 << 62
+    return str(uuid.UUID(int=value))
 
 def is_valid_url(url):
     """Check if URL is valid"""
-    pattern = re.compile(
-        r'^https?://'  # http:// or https://
-        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
-        r'localhost|'  # localhost...
-        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-        r'(?::\d+)?'  # optional port
-        r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-    return bool(pattern.match(url))
+    if len(url) > MAX_URL_LENGTH:
+        return False
+    return bool(URL_RE.match(url))
 
 def clean_html(html_text):
     """Remove HTML tags from text"""
-    clean = re.compile('<.*?>')
-    return re.sub(clean, '', html_text)
+    return HTML_TAG_RE.sub('', html_text)
 
 def extract_mentions(text):
     """Extract @mentions from text"""
-    pattern = r'@(\w+)'
-    return re.findall(pattern, text)
+    return MENTION_RE.findall(text)
 
 def extract_hashtags(text):
     """Extract #hashtags from text"""
-    pattern = r'#(\w+)'
-    return re.findall(pattern, text)
\ No newline at end of file
+    return HASHTAG_RE.findall(text)
\ No newline at end of file
@@ -0,0 +1,72 @@
+"""
+Login Tracking - batch last_login writes off the login path
+"""
+
+import atexit
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.orm.attributes import set_committed_value
+from src.db.models import User, db
+
+# Seconds between batched last_login writes
+LAST_LOGIN_FLUSH_INTERVAL = 60
+
+_pending_logins = {}
+_pending_lock = threading.Lock()
+_flusher_app = None
+
+def record_login(user):
+    """Stamp the user's last_login now and queue the write for the next flush"""
+    now = datetime.utcnow()
+    # Keep the in-memory user current without marking it dirty
+    set_committed_value(user, 'last_login', now)
+
+    with _pending_lock:
+        _pending_logins[user.id] = now
+    _start_flusher(current_app._get_current_object())
+
+def flush_last_logins():
+    """Write all queued last_login values in a single UPDATE"""
+    with _pending_lock:
+        pending = dict(_pending_logins)
+        _pending_logins.clear()
+    if not pending:
+        return
+
+    try:
+        db.session.execute(
+            db.update(User)
+            .where(User.id.in_(pending))
+            .values(last_login=db.case(pending, value=User.id))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        # Re-queue for the next flush unless a newer login replaced the value
+        with _pending_lock:
+            for user_id, logged_in_at in pending.items():
+                _pending_logins.setdefault(user_id, logged_in_at)
+        print(f"Error flushing last_login updates: {e}")
+
+def _start_flusher(app):
+    """Start the background flush thread once per process"""
+    global _flusher_app
+    with _pending_lock:
+        if _flusher_app is not None:
+            return
+        _flusher_app = app
+
+    def run():
+        while True:
+            time.sleep(LAST_LOGIN_FLUSH_INTERVAL)
+            _flush_in_context()
+
+    threading.Thread(target=run, name='last-login-flusher', daemon=True).start()
+    atexit.register(_flush_in_context)
+
+def _flush_in_context():
+    with _flusher_app.app_context():
+        flush_last_logins()
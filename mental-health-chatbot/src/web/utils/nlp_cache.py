@@ -0,0 +1,66 @@
+"""
+NLP Result Caching - share sentiment/intent results across workers
+"""
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from src.web.app import cache
+
+# Seconds an NLP result stays in the shared cache
+NLP_CACHE_TTL = 3600
+
+# Runs sentiment analysis alongside intent detection on cache misses
+_analysis_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='nlp')
+
+def nlp_cache_key(prefix, text):
+    """Build the cache key for an NLP result from a short hash of the text"""
+    return f'nlp:{prefix}:{hashlib.blake2b(text.encode(), digest_size=16).hexdigest()}'
+
+# Results under these prefixes echo the message text, which is stripped before caching and restored on a hit
+_TEXT_ECHO_PREFIXES = frozenset({'sent'})
+
+def _without_text(result):
+    """Copy of an NLP result without the message text, so raw messages never reach the shared cache"""
+    return {key: value for key, value in result.items() if key != 'text'}
+
+def _from_cache(prefix, result, text):
+    """Cached NLP result in the shape the analyzer returns"""
+    if result is None or prefix not in _TEXT_ECHO_PREFIXES:
+        return result
+    return {**result, 'text': text}
+
+def cached_nlp(prefix, ttl=NLP_CACHE_TTL):
+    """Decorator caching a text -> result NLP call in the app cache"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(text):
+            key = nlp_cache_key(prefix, text)
+            result = _from_cache(prefix, cache.get(key), text)
+            if result is None:
+                result = func(text)
+                cache.set(key, _without_text(result), timeout=ttl)
+            return result
+        return wrapper
+    return decorator
+
+def analyze_message(text, sentiment_analyzer, intent_detector):
+    """Sentiment and intent for a message, read from the cache in one round trip"""
+    sentiment_key, intent_key = nlp_cache_key('sent', text), nlp_cache_key('intent', text)
+    sentiment_result, intent_result = cache.get_many(sentiment_key, intent_key)
+    sentiment_result = _from_cache('sent', sentiment_result, text)
+
+    missing = {}
+    sentiment_future = None
+    if sentiment_result is None:
+        sentiment_future = _analysis_executor.submit(sentiment_analyzer.analyze_sentiment, text)
+    if intent_result is None:
+        intent_result = intent_detector.detect_intent(text)
+        missing[intent_key] = _without_text(intent_result)
+    if sentiment_future is not None:
+        sentiment_result = sentiment_future.result()
+        missing[sentiment_key] = _without_text(sentiment_result)
+    if missing:
+        cache.set_many(missing, timeout=NLP_CACHE_TTL)
+
+    return sentiment_result, intent_result
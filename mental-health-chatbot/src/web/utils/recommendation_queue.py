@@ -0,0 +1,73 @@
+"""
+Recommendation Queue - generate chat recommendations off the request path
+"""
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from src.web.app import cache
+
+# Seconds a queued or finished recommendation result waits to be fetched
+RECOMMENDATION_RESULT_TTL = 600
+
+# Recommendations returned for one chat turn
+RECOMMENDATION_LIMIT = 3
+
+# Runs recommendation generation after the chat reply has been sent
+_recommendation_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='recommendations')
+
+def _task_key(task_id):
+    return f'rec:{task_id}'
+
+def recommendation_inputs(sentiment_result, intent_result):
+    """User profile and context for a chat turn's recommendations, or None if the turn needs none"""
+    if not (intent_result.get('primary_intent') == 'recommendation_request' or sentiment_result.get('risk_level') == 'medium'):
+        return None
+
+    user_profile = {
+        'mental_health_status': 'healthy',  # This would come from user data
+        'mood_score': int((sentiment_result.get('polarity', 0) + 1) * 5),  # Convert -1,1 to 1,10
+        'stress_level': 5,  # This would come from user data
+        'preferences': {}
+    }
+
+    current_context = {
+        'current_mood': sentiment_result.get('sentiment_label', 'neutral'),
+        'time_of_day': datetime.now().strftime('%H:%M'),
+        'available_time': 30
+    }
+    return user_profile, current_context
+
+def _generate(app, task_id, owner, engine, user_profile, current_context):
+    """Generate recommendations inside the app context and store them for polling"""
+    with app.app_context():
+        try:
+            recommendations = engine.generate_recommendations(
+                user_profile=user_profile,
+                current_context=current_context
+            )
+            result = {'status': 'complete', 'recommendations': recommendations[:RECOMMENDATION_LIMIT]}
+        except Exception as e:
+            print(f"Error generating recommendations: {e}")
+            result = {'status': 'failed', 'recommendations': []}
+        result['owner'] = owner
+        cache.set(_task_key(task_id), result, timeout=RECOMMENDATION_RESULT_TTL)
+
+def enqueue_recommendations(engine, user_profile, current_context, owner):
+    """Queue recommendation generation for a user and return the task id to poll"""
+    task_id = uuid.uuid4().hex
+    owner = str(owner)
+    # Recorded before the work starts so the owner can be checked while it is still pending
+    cache.set(_task_key(task_id), {'status': 'pending', 'recommendations': [], 'owner': owner},
+              timeout=RECOMMENDATION_RESULT_TTL)
+    app = current_app._get_current_object()
+    _recommendation_executor.submit(_generate, app, task_id, owner, engine, user_profile, current_context)
+    return task_id
+
+def get_recommendation_result(task_id, owner):
+    """Status and recommendations for a task, or None if it is unknown, expired or another user's"""
+    result = cache.get(_task_key(task_id))
+    if result is None or result.get('owner') != str(owner):
+        return None
+    return {'status': result['status'], 'recommendations': result['recommendations']}
@@ -3,39 +3,77 @@ Validation Utilities
 """
 
 import re
-from typing import bool
+import string
+from functools import lru_cache
+from typing import Optional
+import numpy as np
 
+# Patterns compiled once at import
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+USERNAME_RE = re.compile(r'^[a-zA-Z0-9_]+$')
+NON_DIGIT_RE = re.compile(r'\D')
+
+# str.translate table deleting every ASCII character except the digits
+ASCII_NON_DIGITS = str.maketrans('', '', ''.join(chr(c) for c in range(128) if not chr(c).isdigit()))
+
+# Character classes a strong password must each draw from
+PASSWORD_UPPER = frozenset(string.ascii_uppercase)
+PASSWORD_LOWER = frozenset(string.ascii_lowercase)
+PASSWORD_SPECIAL = frozenset('!@#$%^&*(),.?":{}|<>')
+
+# Allowed range of each numeric mood field, and whether it may be left out
+MOOD_FIELD_RANGES = {
+    'mood_score': (1, 10, False),
+    'stress_level': (1, 10, True),
+    'energy_level': (1, 10, True),
+    'sleep_hours': (0, 24, True)
+}
+
+def strip_non_digits(text: str) -> str:
+    """Keep only the decimal digits of a string"""
+    # One C-level translate pass for ASCII input; the regex handles other Unicode digits
+    return text.translate(ASCII_NON_DIGITS) if text.isascii() else NON_DIGIT_RE.sub('', text)
+
+@lru_cache(maxsize=2048)
 def validate_email(email: str) -> bool:
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return bool(EMAIL_RE.match(email))
 
 def validate_password(password: str) -> bool:
     """Validate password strength"""
     if len(password) < 8:
         return False
     
-    # Check for uppercase, lowercase, number, and special character
-    has_upper = bool(re.search(r'[A-Z]', password))
-    has_lower = bool(re.search(r'[a-z]', password))
-    has_number = bool(re.search(r'\d', password))
-    has_special = bool(re.search(r'[!@#$%^&*(),.?":{}|<>]', password))
-    
-    return has_upper and has_lower and has_number and has_special
+    # Check for uppercase, lowercase, number, and special character in one pass
+    has_upper = has_lower = has_digit = has_special = False
+    for ch in password:
+        if ch in PASSWORD_UPPER:
+            has_upper = True
+        elif ch in PASSWORD_LOWER:
+            has_lower = True
+        elif ch.isdecimal():
+            has_digit = True
+        elif ch in PASSWORD_SPECIAL:
+            has_special = True
+        else:
+            continue
+        if has_upper and has_lower and has_digit and has_special:
+            return True
+    return False
 
+@lru_cache(maxsize=2048)
 def validate_username(username: str) -> bool:
     """Validate username format"""
     if len(username) < 3 or len(username) > 20:
         return False
     
     # Only allow letters, numbers, and underscores
-    pattern = r'^[a-zA-Z0-9_]+$'
-    return bool(re.match(pattern, username))
+    return bool(USERNAME_RE.match(username))
 
 def validate_phone(phone: str) -> bool:
     """Validate phone number format"""
     # Remove all non-digit characters
-    digits_only = re.sub(r'\D', '', phone)
+    digits_only = strip_non_digits(phone)
     
     # Check if it's a valid length (10-15 digits)
     return 10 <= len(digits_only) <= 15
@@ -58,4 +96,24 @@ def validate_energy_level(level: int) -> bool:
 
 def validate_sleep_hours(hours: float) -> bool:
     """Validate sleep hours range"""
-    return 0 <= hours <= 24
\ No newline at end of file
+    return 0 <= hours <= 24
+
+
+def validate_range_array(values, low, high, optional=False) -> np.ndarray:
+    """Validate a column of values against a range in one vectorized pass"""
+    arr = np.array([np.nan if value is None else value for value in values], dtype=float)
+    missing = np.isnan(arr)
+    with np.errstate(invalid='ignore'):
+        valid = (arr >= low) & (arr <= high)
+    return valid | missing if optional else valid
+
+def mood_fields_error(entries) -> Optional[str]:
+    """Error message for the first numeric mood field out of range in any entry, or None if all are valid"""
+    for field, (low, high, optional) in MOOD_FIELD_RANGES.items():
+        try:
+            valid = validate_range_array([entry.get(field) for entry in entries], low, high, optional)
+        except (TypeError, ValueError):
+            valid = None
+        if valid is None or not valid.all():
+            return f'{field} must be a number between {low} and {high}'
+    return None
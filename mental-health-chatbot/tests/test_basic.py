@@ -2,6 +2,7 @@
 Basic tests for Mental Health ChatBot
 """
 
+import importlib
 import pytest
 import sys
 import os
@@ -23,6 +24,24 @@ def test_imports():
     except ImportError as e:
         pytest.fail(f"Import failed: {e}")
 
+@pytest.mark.parametrize('module, names', [
+    ('src.nlp.gpt_handler', ['GPTHandler']),
+    ('src.nlp.sentiment_analysis', ['SentimentAnalyzer']),
+    ('src.nlp.intent_detection', ['IntentDetector']),
+    ('src.ml.models.mental_health_classifier', ['MentalHealthClassifier']),
+    ('src.ml.models.recommendation_engine', ['RecommendationEngine']),
+    ('src.db.models', ['User', 'ChatSession', 'Message']),
+    ('src.web.app', ['create_app'])
+])
+def test_module_imports(module, names):
+    """Test that each module can be imported on its own and exposes its classes"""
+    try:
+        imported = importlib.import_module(module)
+    except ImportError as e:
+        pytest.fail(f"Import of {module} failed: {e}")
+    for name in names:
+        assert hasattr(imported, name)
+
 def test_app_creation():
     """Test Flask app creation"""
     from src.web.app import create_app
@@ -30,6 +49,22 @@ def test_app_creation():
     assert app is not None
     assert app.config['TESTING'] is True
 
+def test_config_reads_environment_on_access(monkeypatch):
+    """Test that config values follow the environment, keeping empty values where the baseline did"""
+    from src.web.config import Config
+    
+    monkeypatch.setenv('MAIL_USERNAME', '')
+    monkeypatch.setenv('SECRET_KEY', '')
+    monkeypatch.setenv('REDIS_URL', '')
+    assert Config.MAIL_USERNAME == ''
+    assert Config.SECRET_KEY == 'dev-secret-key-change-in-production'
+    assert Config.SESSION_TYPE is None
+    
+    monkeypatch.setenv('REDIS_URL', 'redis://localhost:6379/0')
+    monkeypatch.delenv('CACHE_TYPE', raising=False)
+    assert Config.SESSION_TYPE == 'redis'
+    assert Config.CACHE_TYPE == 'RedisCache'
+
 def test_sentiment_analyzer():
     """Test sentiment analysis functionality"""
     from src.nlp.sentiment_analysis import SentimentAnalyzer
@@ -52,6 +87,72 @@ def test_intent_detection():
     assert 'confidence' in result
     assert 'urgency_level' in result
 
+def test_intent_without_pattern_match_is_general_question():
+    """Test that text no intent pattern matches falls back to a general question"""
+    from src.nlp.intent_detection import IntentDetector
+    
+    detector = IntentDetector()
+    for text in ["asdf qwerty", "I had lunch", "the weather is nice"]:
+        result = detector.detect_intent(text)
+        assert result['primary_intent'] == 'general_question'
+        assert result['confidence'] == 0.1
+        assert result['all_intents'] == {}
+    
+    assert detector.detect_intent("I want to kill myself")['primary_intent'] == 'crisis'
+
+def test_cached_intent_results_are_not_shared():
+    """Test that mutating a detected intent does not change later cached results"""
+    from src.nlp.intent_detection import IntentDetector
+    
+    detector = IntentDetector()
+    first = detector.detect_intent("hello")
+    expected = first['primary_intent']
+    first['primary_intent'] = 'mutated'
+    
+    assert detector.detect_intent("hello")['primary_intent'] == expected
+
+def test_cached_sentiment_results_are_not_shared():
+    """Test that mutating a sentiment result does not change later cached results"""
+    from src.nlp.sentiment_analysis import SentimentAnalyzer
+    
+    analyzer = SentimentAnalyzer()
+    first = analyzer.analyze_sentiment("I feel great today!")
+    expected = first['sentiment_label']
+    first['sentiment_label'] = 'mutated'
+    
+    assert analyzer.analyze_sentiment("I feel great today!")['sentiment_label'] == expected
+
+def test_sentiment_skips_models_only_without_letters():
+    """Test that short words still reach the models while letterless text skips them"""
+    from src.nlp.sentiment_analysis import SentimentAnalyzer
+    
+    analyzer = SentimentAnalyzer()
+    assert 'skipped' not in analyzer.analyze_sentiment("sad")['emotions']
+    assert analyzer.analyze_sentiment("?!")['emotions']['skipped'] is True
+
+def test_polarity_lexicon_matches_textblob():
+    """Test that the opt-in polarity lexicon agrees with TextBlob on sentiment direction"""
+    from textblob import TextBlob
+    from src.nlp.sentiment_analysis import _load_polarity_lexicon
+    
+    lexicon = _load_polarity_lexicon()
+    assert lexicon is not None
+    
+    texts = [
+        "I feel great today!",
+        "I am very sad and lonely",
+        "This is not good at all",
+        "I don't feel bad",
+        "Everything is terrible and awful",
+        "It was an okay day, nothing special",
+        "hello"
+    ]
+    for text in texts:
+        polarity, subjectivity = lexicon.score(text)
+        expected = TextBlob(text).sentiment
+        assert (polarity > 0.1, polarity < -0.1) == (expected.polarity > 0.1, expected.polarity < -0.1), text
+        assert subjectivity == pytest.approx(expected.subjectivity, abs=1e-6), text
+
 def test_recommendation_engine():
     """Test recommendation engine functionality"""
     from src.ml.models.recommendation_engine import RecommendationEngine
@@ -120,5 +221,107 @@ def test_gad7_scoring():
     assert result['severity'] == 'moderate'
     assert result['risk_level'] == 'medium'
 
+def test_mood_fields_error():
+    """Test that mood entries are range-checked field by field"""
+    from src.web.utils.validators import mood_fields_error
+    
+    assert mood_fields_error([{'mood_score': 7, 'sleep_hours': 7.5}]) is None
+    assert mood_fields_error([{'mood_score': 7}, {'mood_score': 3, 'stress_level': None}]) is None
+    assert mood_fields_error([{}]).startswith('mood_score')
+    assert mood_fields_error([{'mood_score': 11}]).startswith('mood_score')
+    assert mood_fields_error([{'mood_score': 5, 'sleep_hours': 25}]).startswith('sleep_hours')
+    assert mood_fields_error([{'mood_score': 5, 'energy_level': 'high'}]).startswith('energy_level')
+
+class _InlineExecutor:
+    """Executor stand-in that runs submitted work immediately"""
+    
+    def submit(self, func, *args):
+        func(*args)
+
+class _IdleExecutor:
+    """Executor stand-in that never runs submitted work"""
+    
+    def submit(self, func, *args):
+        pass
+
+class _FakeRecommendationEngine:
+    def generate_recommendations(self, user_profile, current_context):
+        return [{'title': f'Recommendation {i}'} for i in range(5)]
+
+def _recommendation_queue(monkeypatch, executor):
+    """Recommendation queue module wired to an in-memory cache and the given executor"""
+    from cachelib import SimpleCache
+    from src.web.utils import recommendation_queue
+    
+    monkeypatch.setattr(recommendation_queue, 'cache', SimpleCache())
+    monkeypatch.setattr(recommendation_queue, '_recommendation_executor', executor)
+    return recommendation_queue
+
+def test_recommendation_inputs_only_for_requests_and_medium_risk():
+    """Test that only recommendation requests and medium-risk turns queue recommendations"""
+    from src.web.utils.recommendation_queue import recommendation_inputs
+    
+    assert recommendation_inputs({'risk_level': 'low'}, {'primary_intent': 'greeting'}) is None
+    assert recommendation_inputs({'risk_level': 'medium', 'polarity': -0.2}, {'primary_intent': 'greeting'}) is not None
+    user_profile, current_context = recommendation_inputs({'risk_level': 'low'}, {'primary_intent': 'recommendation_request'})
+    assert user_profile['mood_score'] == 5
+    assert current_context['current_mood'] == 'neutral'
+
+def test_queued_recommendations_are_owner_only(monkeypatch):
+    """Test that queued recommendations complete and are only returned to their owner"""
+    from flask import Flask
+    
+    queue = _recommendation_queue(monkeypatch, _InlineExecutor())
+    with Flask(__name__).app_context():
+        task_id = queue.enqueue_recommendations(_FakeRecommendationEngine(), {}, {}, owner=7)
+    
+    result = queue.get_recommendation_result(task_id, 7)
+    assert result['status'] == 'complete'
+    assert len(result['recommendations']) == queue.RECOMMENDATION_LIMIT
+    assert 'owner' not in result
+    assert queue.get_recommendation_result(task_id, 8) is None
+    assert queue.get_recommendation_result('unknown', 7) is None
+
+def test_queued_recommendations_report_pending(monkeypatch):
+    """Test that a task reads as pending until its recommendations are generated"""
+    from flask import Flask
+    
+    queue = _recommendation_queue(monkeypatch, _IdleExecutor())
+    with Flask(__name__).app_context():
+        task_id = queue.enqueue_recommendations(_FakeRecommendationEngine(), {}, {}, owner='7')
+    
+    assert queue.get_recommendation_result(task_id, 7) == {'status': 'pending', 'recommendations': []}
+
+def test_export_user_data_rows():
+    """Test that the streamed CSV export writes the mood and assessment rows"""
+    import csv
+    from src.web.app import create_app
+    from src.db.models import db, User, MoodEntry, Assessment
+    
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        user = User(username='exporter', email='exporter@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(MoodEntry(user_id=user.id, mood_score=6, mood_label='calm', notes='walk'))
+        db.session.add(Assessment(user_id=user.id, assessment_type='PHQ-9', responses='{}',
+                                  total_score=7, severity_level='mild'))
+        db.session.commit()
+        user_id = user.id
+    
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    response = client.get('/dashboard/api/export-data?format=csv')
+    rows = list(csv.reader(response.get_data(as_text=True).splitlines()))
+    
+    assert response.status_code == 200
+    assert rows[0][0] == 'Data Type'
+    assert rows[1][0] == 'Mood Entry' and rows[1][2:4] == ['6', 'calm'] and rows[1][7] == 'walk'
+    assert rows[2][0] == 'Assessment'
+    assert rows[2][7] == 'PHQ-9 - PHQ-9 score of 7 indicates mild depression'
+
 if __name__ == '__main__':
     pytest.main([__file__])
\ No newline at end of file
@@ -1,13 +1,34 @@
 import faiss
 import numpy as np
 
+# Corpora up to this size are searched exactly; larger ones use an HNSW graph
+EXACT_SEARCH_MAX_VECTORS = 10000
+HNSW_NEIGHBORS = 32
+HNSW_EF_SEARCH = 64
+
 class Retriever:
     def __init__(self, embeddings, texts):
-        self.index = faiss.IndexFlatL2(len(embeddings[0]))
-        self.index.add(np.array(embeddings).astype('float32'))
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        d = embeddings.shape[1]
+        if len(embeddings) <= EXACT_SEARCH_MAX_VECTORS:
+            self.index = faiss.IndexFlatL2(d)
+        else:
+            self.index = faiss.IndexHNSWFlat(d, HNSW_NEIGHBORS)
+            self.index.hnsw.efSearch = HNSW_EF_SEARCH
+        self.index.add(embeddings)
         self.texts = texts
 
     def query(self, query_embedding, top_k=5):
-        query_embedding = np.array([query_embedding]).astype('float32')
-        _, indices = self.index.search(query_embedding, top_k)
-        return [self.texts[i] for i in indices[0]]
+        query_embedding = np.ascontiguousarray(query_embedding, dtype=np.float32)
+        # A (B, d) matrix is searched in one call and returns one list of texts per query
+        if query_embedding.ndim == 2:
+            return self.query_batch(query_embedding, top_k)
+        # Reshaping a contiguous float32 vector is a view, so no copy is made
+        _, indices = self.index.search(query_embedding.reshape(1, -1), top_k)
+        # FAISS pads with -1 when fewer than top_k vectors are found
+        return [self.texts[i] for i in indices[0] if i >= 0]
+
+    def query_batch(self, query_embeddings, top_k=5):
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        _, indices = self.index.search(query_embeddings, top_k)
+        return [[self.texts[i] for i in row if i >= 0] for row in indices]
@@ -2,7 +2,8 @@ import os
 import json
 import datetime
 
-def save_log(log_folder, chat_log):
-    filename = os.path.join(log_folder, f"chat_log_latest.json")
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(chat_log, f, indent=2, ensure_ascii=False)
+def save_log(log_folder, entry):
+    # One JSON object per line, so each save appends instead of rewriting the whole log
+    filename = os.path.join(log_folder, "chat_log_latest.jsonl")
+    with open(filename, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
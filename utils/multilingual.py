@@ -1,13 +1,62 @@
-from googletrans import Translator
+import logging
+import threading
+from functools import lru_cache
 
-translator = Translator()
+import torch
+from transformers import pipeline
 
+from config import TRANSLATION_MODEL
+
+# NLLB-200 codes for the languages the chatbot translates (the UI currently offers en and hi)
+NLLB_LANGUAGE_CODES = {
+    "en": "eng_Latn",
+    "hi": "hin_Deva",
+    "bn": "ben_Beng",
+    "gu": "guj_Gujr",
+    "mr": "mar_Deva",
+    "ta": "tam_Taml",
+    "te": "tel_Telu",
+    "ur": "urd_Arab",
+}
+
+# Each translation runs a seq2seq decode, so repeated phrases are served from memory
+TRANSLATION_CACHE_SIZE = 4096
+
+logger = logging.getLogger(__name__)
+
+_translator = None
+_translator_lock = threading.Lock()
+
+def _get_translator():
+    # Loaded on first use so the app starts without waiting for the model
+    # Checked again under the lock so only one thread loads it, and never taken once it is loaded
+    global _translator
+    if _translator is None:
+        with _translator_lock:
+            if _translator is None:
+                if torch.cuda.is_available():
+                    _translator = pipeline("translation", model=TRANSLATION_MODEL, device=0,
+                                           model_kwargs={"torch_dtype": torch.float16})
+                else:
+                    _translator = pipeline("translation", model=TRANSLATION_MODEL)
+    return _translator
+
+def _translate(text, src, dest):
+    if src not in NLLB_LANGUAGE_CODES or dest not in NLLB_LANGUAGE_CODES:
+        # Passed through untranslated, so make the gap visible in the server log
+        logger.warning("Unsupported translation language %s -> %s; returning the text untranslated", src, dest)
+        return text
+    result = _get_translator()(text, src_lang=NLLB_LANGUAGE_CODES[src], tgt_lang=NLLB_LANGUAGE_CODES[dest])
+    return result[0]["translation_text"]
+
+@lru_cache(maxsize=TRANSLATION_CACHE_SIZE)
 def translate_to_english(text, lang="hi"):
     if lang == "en":
         return text
-    return translator.translate(text, src=lang, dest='en').text
+    return _translate(text, lang, "en")
 
+@lru_cache(maxsize=TRANSLATION_CACHE_SIZE)
 def translate_from_english(text, lang="hi"):
     if lang == "en":
         return text
-    return translator.translate(text, src='en', dest=lang).text
+    return _translate(text, "en", lang)